@@ -0,0 +1,212 @@
+""" Writes upstream-shaped source files (web-data csv, master time series,
+UID lookup table and country-json) from the bundled cases_time.csv, so the
+importers can run against local files instead of GitHub.
+"""
+import os
+import csv
+import json
+import random
+import shutil
+import datetime
+from src.importer import COUNTRY_JSON_FILES, MASTER_TIMESERIES
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CASES_TIME_CSV = os.path.join(ROOT, "cases_time.csv")
+SAMPLE_RESPONSE_JSON = os.path.join(ROOT, "sample_response.json")
+
+# path of each source of the importers, relative to the sources directory and
+# to the base urls (CSV_BASE_URL: web/, COVID_MASTER_BASE_URL: master/,
+# COUNTRY_JSON_BASE_URL: country-json/)
+SOURCE_PATHS = {
+    "lookup_table": "UID_ISO_FIPS_LookUp_Table.csv",
+    "cases_time": "web/cases_time.csv",
+    "cases_country": "web/cases_country.csv",
+}
+for dataset_name in MASTER_TIMESERIES:
+    SOURCE_PATHS[dataset_name] = f"master/time_series_covid19_{dataset_name}_global.csv"
+for file_name in COUNTRY_JSON_FILES:
+    SOURCE_PATHS[file_name] = "country-json/" + file_name
+
+CASES_TIME_HEADER = [
+    "Province_State", "Country_Region", "Last_Update", "Confirmed", "Deaths", "Recovered", "Active",
+    "Delta_Confirmed", "Delta_Recovered", "Incident_Rate", "People_Tested", "People_Hospitalized",
+    "FIPS", "UID", "iso3", "Report_Date_String"
+]
+CASES_COUNTRY_HEADER = [
+    "Country_Region", "Last_Update", "Lat", "Long_", "Confirmed", "Deaths", "Recovered", "Active",
+    "Incident_Rate", "People_Tested", "People_Hospitalized", "Mortality_Rate", "UID", "ISO3"
+]
+LOOKUP_TABLE_HEADER = [
+    "UID", "iso2", "iso3", "code3", "FIPS", "Admin2", "Province_State", "Country_Region",
+    "Lat", "Long_", "Combined_Key", "Population"
+]
+CONTINENTS = ["Africa", "Asia", "Europe", "North America", "Oceania", "South America"]
+
+def to_int(value) -> int:
+    return int(float(value)) if value else 0
+
+def us_date(date: datetime.date) -> str:
+    """ Returns date as m/d/yy like the upstream csv files.
+    """
+    return f"{date.month}/{date.day}/{date.year % 100}"
+
+def read_cases(path=CASES_TIME_CSV):
+    """ Returns the rows of the bundled cases_time.csv by country, each row a
+    tuple (date, confirmed, deaths, recovered, active, delta_confirmed,
+    delta_recovered) ordered by date.
+    """
+    cases = {}
+    with open(path, encoding="utf-8", newline="") as f:
+        for row in csv.DictReader(f):
+            cases.setdefault(row["Country_Region"], []).append((
+                datetime.datetime.strptime(row["Last_Update"], "%m/%d/%y").date(),
+                to_int(row["Confirmed"]),
+                to_int(row["Deaths"]),
+                to_int(row["Recovered"]),
+                to_int(row["Active"]),
+                to_int(row["Delta_Confirmed"]),
+                to_int(row["Delta_Recovered"]),
+            ))
+
+    for rows in cases.values():
+        rows.sort()
+    return cases
+
+def country_codes(countries):
+    """ Returns synthetic unique (iso2, iso3) codes by country name. The
+    bundled csv has no codes, the codes are only used to join the tables.
+    Beyond 676 countries the "iso2" codes get more letters.
+    """
+    letters = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+    codes = {}
+    for i, country in enumerate(sorted(countries)):
+        iso2 = letters[i // 26 % 26] + letters[i % 26]
+        if i >= 26 * 26:
+            iso2 = letters[i // 676 % 26] + iso2
+        codes[country] = (iso2, iso2 + "X")
+    return codes
+
+def split(value, count, index) -> int:
+    """ Returns the share of province index of count provinces of value, the
+    shares sum up to value.
+    """
+    share = value // count
+    return value - share * (count - 1) if index == 0 else share
+
+def write_csv(path, header, rows):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        writer.writerows(rows)
+
+def write_json(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+
+def write_sources(directory, cases, codes=None, provinces=0):
+    """ Writes all sources of the importers for cases (see read_cases) to
+    directory, at the SOURCE_PATHS. Returns the codes by country.
+
+    With provinces each country gets that many provinces, which share its
+    cases. Like upstream, the web-data csv and the lookup table have the
+    country and the province rows, the master time series only the
+    province rows.
+    """
+    codes = codes or country_codes(cases)
+    province_names = [f"Province {index + 1}" for index in range(provinces)]
+
+    def path(name):
+        return os.path.join(directory, SOURCE_PATHS[name])
+
+    def lookup_rows():
+        uid = 0
+        for country, (iso2, iso3) in sorted(codes.items()):
+            for province in [""] + province_names:
+                uid += 1
+                combined_key = f"{province}, {country}" if province else country
+                yield [uid, iso2, iso3, "", "", "", province, country, "", "", combined_key, ""]
+
+    def cases_time_rows():
+        for country, rows in cases.items():
+            for date, *values in rows:
+                for index, province in enumerate([""] + province_names):
+                    if province:
+                        values_of_province = [split(value, provinces, index - 1) for value in values]
+                    else:
+                        values_of_province = values
+                    confirmed, deaths, recovered, active, delta_confirmed, delta_recovered = values_of_province
+                    yield [
+                        province, country, us_date(date), confirmed, deaths, recovered, active,
+                        delta_confirmed, float(delta_recovered), "", "", "", "", "", codes[country][1],
+                        date.strftime("%Y/%m/%d")
+                    ]
+
+    def master_rows(dates, column):
+        for country, rows in sorted(cases.items()):
+            values = series(rows, dates, column)
+            if not provinces:
+                yield ["", country, 0, 0] + values
+            for index, province in enumerate(province_names):
+                yield [province, country, 0, 0] + [split(value, provinces, index) for value in values]
+
+    write_csv(path("lookup_table"), LOOKUP_TABLE_HEADER, lookup_rows())
+    write_csv(path("cases_time"), CASES_TIME_HEADER, cases_time_rows())
+    write_csv(path("cases_country"), CASES_COUNTRY_HEADER, (
+        [country, f"{rows[-1][0].isoformat()} 23:59:59", "", "", *rows[-1][1:5], "", "", "", "", "",
+         codes[country][1]]
+        for country, rows in cases.items()
+    ))
+
+    dates = sorted({row[0] for rows in cases.values() for row in rows})
+    for column, dataset_name in enumerate(MASTER_TIMESERIES, 1):
+        header = ["Province/State", "Country/Region", "Lat", "Long"] + [us_date(date) for date in dates]
+        write_csv(path(dataset_name), header, master_rows(dates, column))
+
+    write_country_json(directory, codes)
+    return codes
+
+def series(rows, dates, column) -> list:
+    """ Returns the values of column of rows for each of dates, 0 before the
+    first row of a country.
+    """
+    values = {row[0]: row[column] for row in rows}
+    result, value = [], 0
+    for date in dates:
+        value = values.get(date, value)
+        result.append(value)
+    return result
+
+def write_country_json(directory, codes):
+    """ Writes the country-json files with random but reproducible
+    attributes for each country.
+    """
+    attributes = {file_name: [] for file_name in COUNTRY_JSON_FILES}
+    for country, (iso2, _) in sorted(codes.items()):
+        rng = random.Random(country)
+        attributes["country-by-abbreviation.json"].append({"country": country, "abbreviation": iso2})
+        attributes["country-by-population.json"].append(
+            {"country": country, "population": rng.randint(10 ** 4, 10 ** 9)})
+        attributes["country-by-life-expectancy.json"].append(
+            {"country": country, "expectancy": round(rng.uniform(50, 85), 1)})
+        attributes["country-by-continent.json"].append(
+            {"country": country, "continent": rng.choice(CONTINENTS)})
+        attributes["country-by-capital-city.json"].append(
+            {"country": country, "city": f"{country} City"})
+        attributes["country-by-population-density.json"].append(
+            {"country": country, "density": round(rng.uniform(1, 1000), 2)})
+        attributes["country-by-yearly-average-temperature.json"].append(
+            {"country": country, "temperature": round(rng.uniform(-5, 30), 2)})
+
+    for file_name, items in attributes.items():
+        write_json(os.path.join(directory, SOURCE_PATHS[file_name]), items)
+
+def fill_source_cache(directory, cache_directory):
+    """ Copies the sources of directory into the source cache of the
+    importers, so they import them with IMPORT_OFFLINE.
+    """
+    shutil.rmtree(cache_directory, ignore_errors=True)
+    os.makedirs(cache_directory)
+    for name, path in SOURCE_PATHS.items():
+        shutil.copyfile(os.path.join(directory, path), os.path.join(cache_directory, name))
@@ -0,0 +1,62 @@
+""" Generates upstream-shaped sources at a multiple of the bundled data.
+
+    python -m benchmarks.generate /tmp/sources --countries 10 --history 6 --provinces 5
+
+writes the web-data cases_time.csv and cases_country.csv, the master time
+series, the UID lookup table and the country-json files of 10 times the
+countries, 6 times the days and 5 provinces per country to /tmp/sources.
+Serve them with `python -m benchmarks.server /tmp/sources`.
+"""
+import os
+import sys
+import argparse
+import datetime
+from . import fixtures
+
+def scale_cases(cases, countries=1, history=1):
+    """ Returns cases (see fixtures.read_cases) with countries copies of each
+    country and history times the days. The copies are named `<country> 2`,
+    `<country> 3`, ... Each repetition of the days continues the cumulative
+    counts of the one before, so the counts keep increasing.
+    """
+    dates = sorted({row[0] for rows in cases.values() for row in rows})
+    period = datetime.timedelta(days=(dates[-1] - dates[0]).days + 1)
+
+    scaled = {}
+    for country, rows in cases.items():
+        timeline = []
+        for repetition in range(history):
+            # confirmed, deaths, recovered and active continue, the deltas repeat
+            offsets = [repetition * value for value in rows[-1][1:5]]
+            timeline += [
+                (date + repetition * period, *(value + offset for value, offset in zip(values[:4], offsets)),
+                 *values[4:])
+                for date, *values in rows
+            ]
+
+        scaled[country] = timeline
+        for copy in range(2, countries + 1):
+            scaled[f"{country} {copy}"] = timeline
+
+    return scaled
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("directory", help="directory of the generated sources")
+    parser.add_argument("--countries", type=int, default=1, help="multiple of the countries")
+    parser.add_argument("--history", type=int, default=1, help="multiple of the days")
+    parser.add_argument("--provinces", type=int, default=0, help="provinces per country")
+    args = parser.parse_args(argv)
+
+    cases = scale_cases(fixtures.read_cases(), args.countries, args.history)
+    fixtures.write_sources(args.directory, cases, provinces=args.provinces)
+
+    print(f"Generated {len(cases)} countries with {sum(len(rows) for rows in cases.values())} days "
+          f"and {args.provinces} provinces each:")
+    for path in sorted(set(fixtures.SOURCE_PATHS.values())):
+        size = os.path.getsize(os.path.join(args.directory, path))
+        print(f"{size:>14,} {path}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
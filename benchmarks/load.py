@@ -0,0 +1,150 @@
+""" Load driver for a running server, e.g. waitress.
+
+    venv/bin/waitress-serve --threads 8 --call src:create_app
+    python -m benchmarks.load http://127.0.0.1:8080 --rate 200 --duration 30
+
+sends requests to the endpoints of benchmarks.run at a fixed rate and
+reports the throughput and the latency percentiles. The latency of a
+request is measured from the time it was due, not from the time it was
+sent, so a server which falls behind shows its queueing time.
+"""
+import sys
+import json
+import time
+import queue
+import argparse
+import threading
+import requests
+from .run import ENDPOINTS, COUNTRY, percentile
+
+LOAD_RATE = 100
+LOAD_DURATION = 30
+LOAD_WORKERS = 64
+LOAD_TIMEOUT = 30
+
+def get_requests(base_url, names=None, country=COUNTRY) -> list:
+    """ Returns (name, url) of the ENDPOINTS with names (default: all except
+    the exports). The codes are those of the first countries of the server.
+    """
+    codes = requests.get(base_url + "/countries?fields=code&format=columnar", timeout=LOAD_TIMEOUT).json()
+    codes = [code for code in codes.get("code", []) if code]
+    values = {
+        "country": country,
+        "code": codes[0] if codes else "",
+        "codes": ",".join(codes[:10]),
+    }
+    return [
+        (name, url.format(**values)) for name, url in ENDPOINTS
+        if (name in names if names else not name.startswith("export"))
+    ]
+
+def drive(base_url, load_requests, rate=LOAD_RATE, duration=LOAD_DURATION, workers=LOAD_WORKERS) -> dict:
+    """ Sends rate requests per second for duration seconds, cycling through
+    load_requests, from workers threads. Returns the latencies, statuses
+    and sizes by request name and the elapsed seconds.
+    """
+    due = queue.Queue()
+    results = {name: [] for name, _ in load_requests}
+
+    def worker():
+        session = requests.Session()
+        while True:
+            item = due.get()
+            if item is None:
+                break
+            due_time, name, url = item
+            try:
+                response = session.get(base_url + url, timeout=LOAD_TIMEOUT)
+                status, size = response.status_code, len(response.content)
+            except requests.RequestException:
+                status, size = None, 0
+            results[name].append((time.perf_counter() - due_time, status, size))
+        session.close()
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(workers)]
+    for thread in threads:
+        thread.start()
+
+    start_time = time.perf_counter()
+    for i in range(int(rate * duration)):
+        due_time = start_time + i / rate
+        delay = due_time - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        name, url = load_requests[i % len(load_requests)]
+        due.put((due_time, name, url))
+
+    for _ in threads:
+        due.put(None)
+    for thread in threads:
+        thread.join()
+
+    return {"elapsed": time.perf_counter() - start_time, "results": results}
+
+def latencies(results) -> dict:
+    milliseconds = [latency * 1000 for latency, _, _ in results]
+    if not milliseconds:
+        return {}
+    return {
+        "p50_ms": percentile(milliseconds, 50),
+        "p90_ms": percentile(milliseconds, 90),
+        "p99_ms": percentile(milliseconds, 99),
+        "p999_ms": percentile(milliseconds, 99.9),
+        "max_ms": max(milliseconds),
+    }
+
+def report(run, rate, workers) -> dict:
+    all_results = [result for results in run["results"].values() for result in results]
+    errors = sum(1 for _, status, _ in all_results if status is None or status >= 400)
+    return {
+        "target_rate": rate,
+        "workers": workers,
+        "elapsed": run["elapsed"],
+        "requests": len(all_results),
+        "errors": errors,
+        "throughput": len(all_results) / run["elapsed"],
+        "bytes": sum(size for _, _, size in all_results),
+        **latencies(all_results),
+        "endpoints": {
+            name: dict(
+                requests=len(results),
+                errors=sum(1 for _, status, _ in results if status is None or status >= 400),
+                mean_bytes=sum(size for _, _, size in results) / len(results) if results else 0,
+                **latencies(results)
+            )
+            for name, results in run["results"].items()
+        },
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("base_url", help="url of the server, e.g. http://127.0.0.1:8080")
+    parser.add_argument("--rate", type=float, default=LOAD_RATE, help="requests per second")
+    parser.add_argument("--duration", type=float, default=LOAD_DURATION, help="seconds")
+    parser.add_argument("--workers", type=int, default=LOAD_WORKERS, help="concurrent connections")
+    parser.add_argument("--endpoint", action="append", help="name of an endpoint of benchmarks.run, repeatable")
+    parser.add_argument("--country", default=COUNTRY)
+    parser.add_argument("--output", help="write the report to this json file")
+    args = parser.parse_args(argv)
+
+    base_url = args.base_url.rstrip("/")
+    run = drive(base_url, get_requests(base_url, args.endpoint, args.country),
+                args.rate, args.duration, args.workers)
+    result = report(run, args.rate, args.workers)
+
+    print(f"{result['requests']} requests in {result['elapsed']:.1f} s, "
+          f"{result['throughput']:.1f} requests/s (target {args.rate}), {result['errors']} errors")
+    print(f"{'endpoint':28} {'requests':>8} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for name, values in [("all", result)] + list(result["endpoints"].items()):
+        if values["requests"]:
+            print(f"{name:28} {values['requests']:>8} {values['p50_ms']:>8.1f} "
+                  f"{values['p99_ms']:>8.1f} {values['max_ms']:>8.1f}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+
+    return 1 if result["errors"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,268 @@
+""" Benchmarks of the importer stages and the api endpoints against a fixture
+database built from the bundled cases_time.csv.
+
+    python -m benchmarks.run --output benchmarks/baseline.json
+    python -m benchmarks.run --compare benchmarks/baseline.json
+    python -m benchmarks.run --countries 10 --history 6 --provinces 5
+
+The results are written as json. With --compare the medians and tail
+latencies are compared to an earlier result and the exit status is 1 if one
+of them got slower than --threshold.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import statistics
+import datetime
+from src import create_app, db, cache, snapshots, timeseries
+from src.fetch import SourceFetcher
+from src.loader import BulkLoader
+from src.importer import CovidImporter, CountryImporter, MASTER_TIMESERIES
+from . import fixtures
+from .generate import scale_cases
+
+IMPORT_REPEAT = 5
+REQUEST_REPEAT = 50
+THRESHOLD = 1.25
+
+# (name, url) of the benchmarked requests, {country} and {code} are a
+# country of the fixtures, {codes} ten codes
+ENDPOINTS = [
+    ("countries", "/countries"),
+    ("countries_code", "/countries?code={code}"),
+    ("cases_total", "/covid19/cases-total"),
+    ("cases_total_country", "/covid19/cases-total?country={country}"),
+    ("cases_total_worldwide", "/covid19/cases-total?worldwide=1"),
+    ("cases_total_columnar", "/covid19/cases-total?format=columnar&fields=code,confirmed"),
+    ("cases_by_country", "/covid19/cases-by-country?country={country}"),
+    ("cases_by_country_batch", "/covid19/cases-by-country?code={codes}"),
+    ("cases_by_country_page", "/covid19/cases-by-country?country={country}&since=2020-03-01&limit=14"),
+    ("cases_daily", "/covid19/cases-daily"),
+    ("cases_daily_country", "/covid19/cases-daily?country={country}"),
+    ("cases_daily_columnar", "/covid19/cases-daily?format=columnar&fields=confirmed"),
+    ("export_cases_time", "/export/cases_time"),
+    ("export_cases_total", "/export/cases_total?format=ndjson"),
+    ("status", "/status"),
+]
+COUNTRY = "Austria"
+
+def percentile(values, percent):
+    values = sorted(values)
+    return values[min(len(values) - 1, round(percent / 100 * (len(values) - 1)))]
+
+def timed(function, *args):
+    """ Returns (seconds, result) of function(*args).
+    """
+    start_time = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - start_time, result
+
+def summarize(seconds) -> dict:
+    return {
+        "min": min(seconds),
+        "median": statistics.median(seconds),
+        "max": max(seconds),
+    }
+
+def benchmark_importer(repeat) -> dict:
+    """ Times each stage of the country and covid importers, in the order of
+    a full import. Has to run in an app context.
+    """
+    stages = {}
+
+    def stage(name, function, *args):
+        seconds, result = timed(function, *args)
+        # stages which import a table return its number of rows
+        rows = result if isinstance(result, int) else None
+        stages.setdefault(name, {"rows": rows, "seconds": []})["seconds"].append(seconds)
+
+    covid_importer = CovidImporter(force=True)
+    country_importer = CountryImporter(force=True)
+    with SourceFetcher.from_config() as fetcher:
+        fetcher.fetch_all({**covid_importer._sources(), **country_importer._sources()})
+
+        for _ in range(repeat):
+            country_importer.loader = covid_importer.loader = BulkLoader.from_config()
+            stage("countries", country_importer._import_country_data, fetcher)
+            stage("lookup_table", covid_importer.init_lookup_table, fetcher.open_lines("lookup_table"))
+            stage("cases_time", covid_importer._read_and_import_csv, fetcher.open_lines("cases_time"), "cases_time")
+            stage("cases_time_upsert", covid_importer._upsert_cases_time, fetcher.open_lines("cases_time"))
+            stage("cases_total", covid_importer._import_cases_total)
+            stage("cases_country", covid_importer._read_and_import_csv,
+                  fetcher.open_lines("cases_country"), "cases_country")
+            for dataset_name in MASTER_TIMESERIES:
+                stage(f"master_{dataset_name}", covid_importer._read_and_import_master_timeseries,
+                      dataset_name, fetcher.open_lines(dataset_name))
+            stage("rollups", covid_importer._build_rollups)
+            stage("snapshots", snapshots.build_snapshots)
+            stage("timeseries", timeseries.TimeSeries.load, db.get_writer_db())
+
+    for _ in range(repeat):
+        stage("covid_import", CovidImporter(force=True).start)
+
+    return {
+        name: dict(summarize(result["seconds"]), rows=result["rows"])
+        for name, result in stages.items()
+    }
+
+def check_fixture(client):
+    """ Checks the imported timeline of COUNTRY against sample_response.json.
+    """
+    with open(fixtures.SAMPLE_RESPONSE_JSON, encoding="utf-8") as f:
+        expected = [
+            (datetime.datetime.strptime(item["last_update"], "%m/%d/%y").date().isoformat(),
+             item["confirmed"], item["deaths"], item["recovered"])
+            for item in json.load(f)
+        ]
+    timeline = client.get(f"/covid19/cases-by-country?country={COUNTRY}").get_json()["timeline"]
+    imported = [
+        (item["date"], item["confirmed"], item["deaths"], item["recovered"]) for item in timeline
+    ]
+    if imported != expected:
+        raise RuntimeError(f"Imported timeline of {COUNTRY} differs from sample_response.json")
+
+def benchmark_endpoints(client, repeat, values) -> dict:
+    """ Times repeat requests of each of ENDPOINTS after one warm up request.
+    """
+    results = {}
+    for name, url in ENDPOINTS:
+        url = url.format(**values)
+        response = client.get(url)
+        body_size = len(response.get_data())
+
+        milliseconds = []
+        for _ in range(repeat):
+            seconds, _ = timed(lambda: client.get(url).get_data())
+            milliseconds.append(seconds * 1000)
+
+        results[name] = {
+            "url": url,
+            "status": response.status_code,
+            "bytes": body_size,
+            "mean_ms": statistics.mean(milliseconds),
+            "p50_ms": percentile(milliseconds, 50),
+            "p90_ms": percentile(milliseconds, 90),
+            "p99_ms": percentile(milliseconds, 99),
+        }
+    return results
+
+def run(import_repeat=IMPORT_REPEAT, request_repeat=REQUEST_REPEAT, countries=1, history=1, provinces=0) -> dict:
+    """ Runs the benchmarks with the bundled data scaled by countries,
+    history and provinces, see benchmarks.generate.
+    """
+    cases = scale_cases(fixtures.read_cases(), countries, history)
+    with tempfile.TemporaryDirectory() as directory:
+        sources = os.path.join(directory, "sources")
+        codes = fixtures.write_sources(sources, cases, provinces=provinces)
+        fixtures.fill_source_cache(sources, os.path.join(directory, "source_cache"))
+
+        config = {
+            "TESTING": True,
+            "DATABASE": os.path.join(directory, "benchmark.sqlite"),
+            "SOURCE_CACHE_DIR": os.path.join(directory, "source_cache"),
+            "IMPORT_OFFLINE": True,
+            "IMPORT_WORKER": "thread",
+        }
+        app = create_app(config)
+        with app.app_context():
+            db.init_db()
+            importer = benchmark_importer(import_repeat)
+            cache.invalidate()
+
+        values = {
+            "country": COUNTRY,
+            "code": codes[COUNTRY][0],
+            "codes": ",".join(sorted(code for code, _ in codes.values())[:10]),
+        }
+        if history == 1:
+            check_fixture(app.test_client())
+        endpoints = benchmark_endpoints(app.test_client(), request_repeat, values)
+
+        # every request is rendered, only the snapshots are still served
+        uncached_app = create_app(dict(config, RESPONSE_CACHE_MAX_BYTES=0))
+        endpoints_uncached = benchmark_endpoints(uncached_app.test_client(), request_repeat, values)
+
+        for extension_app in (app, uncached_app):
+            extension_app.extensions["jobs"].shutdown()
+            extension_app.extensions["db_pool"].close_all()
+
+    return {
+        "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "fixture": {
+            "countries": len(cases),
+            "rows": sum(len(rows) for rows in cases.values()),
+            "provinces": provinces,
+        },
+        "import_repeat": import_repeat,
+        "request_repeat": request_repeat,
+        "importer": importer,
+        "endpoints": endpoints,
+        "endpoints_uncached": endpoints_uncached,
+    }
+
+# compared timings of each section of the results
+COMPARED = {
+    "importer": ["median"],
+    "endpoints": ["p50_ms", "p99_ms"],
+    "endpoints_uncached": ["p50_ms", "p99_ms"],
+}
+
+def compare(result, baseline, threshold=THRESHOLD) -> list:
+    """ Prints the ratio of each compared timing of result to baseline and
+    returns the (section, name, key, ratio) of those above threshold.
+    """
+    regressions = []
+    for section, keys in COMPARED.items():
+        for name, values in result[section].items():
+            old_values = baseline.get(section, {}).get(name)
+            if old_values is None:
+                continue
+            for key in keys:
+                if not old_values.get(key):
+                    continue
+                ratio = values[key] / old_values[key]
+                flag = "  SLOWER" if ratio > threshold else ""
+                print(f"{section:20} {name:28} {key:7} {old_values[key]:10.4f} {values[key]:10.4f} {ratio:6.2f}{flag}")
+                if ratio > threshold:
+                    regressions.append((section, name, key, ratio))
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output", help="write the results to this json file")
+    parser.add_argument("--compare", help="compare the results to this earlier result")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD,
+                        help="ratio of a slower timing which is a regression (default %(default)s)")
+    parser.add_argument("--import-repeat", type=int, default=IMPORT_REPEAT)
+    parser.add_argument("--request-repeat", type=int, default=REQUEST_REPEAT)
+    parser.add_argument("--countries", type=int, default=1, help="multiple of the countries")
+    parser.add_argument("--history", type=int, default=1, help="multiple of the days")
+    parser.add_argument("--provinces", type=int, default=0, help="provinces per country")
+    args = parser.parse_args(argv)
+
+    result = run(args.import_repeat, args.request_repeat, args.countries, args.history, args.provinces)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+    else:
+        json.dump(result, sys.stdout, indent=2)
+        print()
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            regressions = compare(result, json.load(f), args.threshold)
+        if regressions:
+            print(f"{len(regressions)} timings are slower than {args.threshold} times the baseline")
+            return 1
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
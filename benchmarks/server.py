@@ -0,0 +1,70 @@
+""" Serves generated sources (see benchmarks.generate) in place of GitHub.
+
+    python -m benchmarks.server /tmp/sources --port 8000
+
+The importers download from it with the printed config. Responses have a
+Last-Modified header and unchanged files are answered with 304, like
+raw.githubusercontent.com.
+"""
+import sys
+import time
+import argparse
+import functools
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+class SourceHandler(SimpleHTTPRequestHandler):
+    """ Serves the files of directory, each response delayed by delay
+    seconds to simulate the latency of the upstream server.
+    """
+
+    def __init__(self, *args, delay=0, quiet=True, **kwargs):
+        self.delay = delay
+        self.quiet = quiet
+        super().__init__(*args, **kwargs)
+
+    def send_head(self):
+        if self.delay:
+            time.sleep(self.delay)
+        return super().send_head()
+
+    def log_message(self, format, *args):
+        if not self.quiet:
+            super().log_message(format, *args)
+
+def config(base_url) -> dict:
+    """ Returns the app config which imports from the server at base_url.
+    """
+    return {
+        "CSV_BASE_URL": base_url + "web/",
+        "COVID_MASTER_BASE_URL": base_url + "master/",
+        "COUNTRY_LUT_URL": base_url + "UID_ISO_FIPS_LookUp_Table.csv",
+        "COUNTRY_JSON_BASE_URL": base_url + "country-json/",
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("directory", help="directory of the generated sources")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--delay", type=float, default=0, help="seconds before each response")
+    parser.add_argument("--verbose", action="store_true", help="log each request")
+    args = parser.parse_args(argv)
+
+    handler = functools.partial(
+        SourceHandler, directory=args.directory, delay=args.delay, quiet=not args.verbose)
+    server = ThreadingHTTPServer((args.host, args.port), handler)
+
+    print("Add to instance/config.py:")
+    for name, value in config(f"http://{args.host}:{server.server_port}/").items():
+        print(f"{name} = {value!r}")
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
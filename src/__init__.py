@@ -5,15 +5,21 @@ import json
 import csv
 import requests
 import time
+import multiprocessing
 from . import db
+from . import cache
+from . import conditional
+from . import export
+from . import jobs
+from . import metrics
+from . import queries
+from . import snapshots
+from . import timeseries
+from . import utils
+from .formats import Projection
 from flask_cors import CORS, cross_origin
-from flask import Flask, g, request, jsonify, current_app
+from flask import Flask, g, request, jsonify, current_app, stream_with_context
 import logging
-import atexit
-from .importer import CovidImporter, CountryImporter
-from .utils import map_date
-
-from apscheduler.schedulers.background import BackgroundScheduler
 
 CSV_BASE_URL="https://raw.githubusercontent.com/CSSEGISandData/COVID-19/web-data/data/"
 COUNTRY_JSON_BASE_URL="https://raw.githubusercontent.com/samayo/country-json/master/src/"
@@ -48,6 +54,12 @@ def create_app(test_config=None):
 
     # db init
     db.init_app(app)
+    cache.init_app(app)
+    snapshots.init_app(app)
+    timeseries.init_app(app)
+    conditional.init_app(app)
+    jobs.init_app(app)
+    metrics.init_app(app)
 
     @app.route('/import_countries')
     def import_countries():
@@ -57,10 +69,9 @@ def create_app(test_config=None):
             current_app.logger.info("Wrong password entered for covid import")
             return jsonify(404)
 
-        importer = CountryImporter()
-        importer.start()
+        job = jobs.get_runner().submit("countries", force=utils.parse_bool(request.args.get("force")))
 
-        return jsonify(True)
+        return jsonify(job.to_dict()), 202
 
 
     @app.route('/covid19/import_data')
@@ -71,288 +82,146 @@ def create_app(test_config=None):
             current_app.logger.info("Wrong password entered for covid import")
             return jsonify(404)
 
-        importer = CovidImporter()
-        importer.start()
+        job = jobs.get_runner().submit(
+            "covid",
+            force=utils.parse_bool(request.args.get("force")),
+            full=utils.parse_bool(request.args.get("full"))
+        )
 
-        return jsonify(True)
+        return jsonify(job.to_dict()), 202
 
-    @app.route('/countries')
-    def countries():
-        country_filter = request.args.get("country")
-        country_code_filter = request.args.get("code")
-
-        where = ""
-        if country_filter:
-            where = f" WHERE LOWER(name) = '{country_filter.lower()}'"
-        elif country_code_filter:
-            where = f" WHERE LOWER(code) = '{country_code_filter.lower()}'"
-
-        query = f"""
-        SELECT code, name, population, life_expectancy, continent, capital, population_density, avg_temperature
-        FROM countries
-        {where}
-        ORDER BY name ASC
-        """
+    @app.route('/covid19/import_status/<job_id>')
+    def import_status(job_id):
+        job = jobs.get_runner().get(job_id)
 
-        cursor = db.get_db().cursor()
-        cursor.execute(query)
-
-        result = []
-        country = {}
-        for row in cursor.fetchall():
-            code, name, population, life_expectancy, continent, capital, population_density, avg_temperature = row
-            country = {
-                "code": code,
-                "name": name,
-                "population": population,
-                "life_expectancy": life_expectancy,
-                "continent": continent,
-                "capital": capital,
-                "population_density": population_density,
-                "avg_temperature": avg_temperature
-            }
-            result.append(country)
-
-            if country_filter or country_code_filter:
-                result = country
-
-        return jsonify(result)
+        if job is None:
+            return "unknown import job", 404
 
-    @app.route('/covid19/cases-by-country')
-    def cases_by_country():
-        country = request.args.get("country")
+        return jsonify(job.to_dict())
 
-        if not country:
-            return "please provide a country", 400
+    @app.route('/status')
+    def status():
+        return jsonify({
+            "db_pool": db.get_pool().stats(),
+            "response_cache": cache.get_cache().stats(),
+        })
 
-        cursor = db.get_db().cursor()
-        queryCases = f"""
-        SELECT country_region, confirmed, deaths, recovered, last_update
-        FROM cases_time
-        WHERE LOWER(country_region) = '{country.lower()}'
-        ORDER BY last_update ASC
-        """
-        cursor.execute(queryCases)
+    @app.route('/metrics')
+    def prometheus_metrics():
+        if metrics.get_metrics() is None:
+            return "metrics are disabled", 404
 
-        cursor1 = db.get_db().cursor()
-        queryCountry = f"""
-        SELECT code, name, population, life_expectancy, continent, capital, population_density, avg_temperature
-        FROM countries
-        WHERE LOWER(name) = '{country.lower()}'
-        """
-        cursor1.execute(queryCountry)
-
-        countries = []
-        for row in cursor1.fetchall():
-            code, name, population, life_expectancy, continent, capital, population_density, avg_temperature = row
-            countries.append({
-                "code": code,
-                "name": name,
-                "population": population,
-                "life_expectancy": life_expectancy,
-                "continent": continent,
-                "capital": capital,
-                "population_density": population_density,
-                "avg_temperature": avg_temperature
-            })
-
-        result = {}
-        count = 0
-        for row in cursor.fetchall():
-            country_region, confirmed, deaths, recovered, last_update = row
-            count += 1
-            if count == 1:
-                result = {
-                    "country": countries[0],
-                    "timeline": []
-                }
-
-            result.get("timeline").append({
-                "date": last_update,
-                "confirmed": confirmed,
-                "deaths": deaths,
-                "recovered": recovered,
-            })
-
-        return jsonify(result)
-
-    def get_cases_worldwide():
-        cursor = db.get_db().cursor()
-        query = f"""
-        SELECT
-            sum(cc.confirmed),
-            sum(cc.deaths),
-            sum(cc.recovered),
-            max(ct.last_update),
-            sum(ct.delta_confirmed),
-            sum(ct.delta_recovered),
-            sum(ct.delta_deaths)
-        FROM cases_total ct
-        JOIN cases_country cc ON ct.country_code = cc.country_code
+        return current_app.response_class(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+    def get_list_args():
+        """ Returns the country and code lists of the query parameters.
         """
-        cursor.execute(query)
+        country_filter = queries.split_list(request.args.getlist("country"))
+        country_code_filter = queries.split_list(request.args.getlist("code"))
+        if max(len(country_filter), len(country_code_filter)) > queries.BATCH_MAX_COUNTRIES:
+            raise ValueError(f"at most {queries.BATCH_MAX_COUNTRIES} countries per request")
+        return country_filter, country_code_filter
+
+    def paginated(result, page):
+        response = jsonify(result)
+        if page.next_cursor is not None:
+            response.headers["X-Next-Cursor"] = page.next_cursor
+        return response
+
+    @app.route('/countries')
+    @conditional.conditional_response
+    @snapshots.snapshot_response("countries", when=snapshots.unfiltered)
+    @cache.cached_response
+    def countries():
+        try:
+            country_filter, country_code_filter = get_list_args()
+            projection = Projection.from_args(request.args)
+        except ValueError as error:
+            return str(error), 400
 
-        result = {}
-        row = cursor.fetchone()
-        confirmed, deaths, recovered, last_update, delta_confirmed, delta_recovered, delta_deaths = row
+        return jsonify(queries.get_countries(country_filter, country_code_filter, projection))
 
-        result = {
-            "confirmed": confirmed,
-            "deaths": deaths,
-            "recovered": recovered,
-            "delta_confirmed": delta_confirmed,
-            "delta_recovered": delta_recovered,
-            "delta_deaths": delta_deaths,
-            "date": map_date(last_update)
-        }
+    @app.route('/covid19/cases-by-country')
+    @conditional.conditional_response
+    @cache.cached_response
+    def cases_by_country():
+        try:
+            country_filter, country_code_filter = get_list_args()
+            page = queries.Page.from_args(request.args)
+            projection = Projection.from_args(request.args)
+        except ValueError as error:
+            return str(error), 400
+
+        if not country_filter and not country_code_filter:
+            return "please provide a country", 400
 
-        return jsonify(result)
+        return paginated(
+            queries.get_cases_by_country(country_filter, country_code_filter, page, projection), page)
 
     @app.route('/covid19/cases-total')
+    @conditional.conditional_response
+    @snapshots.snapshot_response("cases-total-worldwide", when=snapshots.worldwide)
+    @snapshots.snapshot_response("cases-total", when=snapshots.unfiltered)
+    @cache.cached_response
     def cases_by_countries():
-        country_filter = request.args.get("country")
-        country_code_filter = request.args.get("code")
-        worldwide = request.args.get("worldwide")
+        worldwide = utils.parse_bool(request.args.get("worldwide"))
+
+        try:
+            projection = Projection.from_args(request.args)
+            country_filter, country_code_filter = get_list_args()
+        except ValueError as error:
+            return str(error), 400
 
         if worldwide:
-            return get_cases_worldwide()
-
-        cursor = db.get_db().cursor()
-
-        where = ""
-        if country_filter:
-            where = f"WHERE LOWER(ct.country_region) = '{country_filter.lower()}'"
-        elif country_code_filter:
-            where = f" WHERE LOWER(ct.country_code) = '{country_code_filter.lower()}'"
-
-        query = f"""
-        SELECT
-            ct.country_region,
-            cc.confirmed,
-            cc.deaths,
-            cc.recovered,
-            cc.active,
-            ct.last_update,
-            ct.delta_confirmed,
-            ct.delta_recovered,
-            ct.delta_deaths,
-            c.code,
-            c.name,
-            c.population,
-            c.life_expectancy,
-            c.continent,
-            c.capital,
-            c.population_density,
-            c.avg_temperature
-        FROM cases_total ct
-        JOIN countries c ON ct.country_code = c.code
-        JOIN cases_country cc ON cc.country_code = ct.country_code
-        { where }
-        ORDER BY c.name
-        """
-        cursor.execute(query)
-
-        result = []
-        country = {}
-        cases = {}
-        for row in cursor.fetchall():
-            country_region, confirmed, deaths, recovered, active, last_update, delta_confirmed, delta_recovered, delta_deaths, code, name, population, life_expectancy, continent, capital, population_density, avg_temperature = row
-
-            country = {
-                "code": code,
-                "name": name,
-                "population": population,
-                "life_expectancy": life_expectancy,
-                "continent": continent,
-                "capital": capital,
-                "population_density": population_density,
-                "avg_temperature": avg_temperature
-            }
-
-            cases = {
-                "confirmed": getIntOrNone(confirmed),
-                "deaths": getIntOrNone(deaths),
-                "recovered": getIntOrNone(recovered),
-                "active": getIntOrNone(active),
-                "delta_confirmed": getIntOrNone(delta_confirmed),
-                "delta_recovered": getIntOrNone(delta_recovered),
-                "delta_deaths": getIntOrNone(delta_deaths),
-                "date": last_update
-            }
-
-            if not country_filter or not country_code_filter:
-                result.append({
-                    "country": country,
-                    "cases": cases,
-                })
-            else:
-                result = cases
-
-        return jsonify(result)
-
-    def getIntOrNone(value):
-        if isinstance(value, int):
-            return value
-        return None
+            return jsonify(queries.get_cases_worldwide(projection))
+
+        return jsonify(queries.get_cases_total(country_filter, country_code_filter, projection))
 
     @app.route('/covid19/cases-daily')
+    @conditional.conditional_response
+    @snapshots.snapshot_response("cases-daily", when=snapshots.unfiltered)
+    @cache.cached_response
     def cases_total_days():
-        country_filter = request.args.get("country")
-        country_code_filter = request.args.get("code")
-
-        where = ""
-        if country_filter:
-            where = f"WHERE LOWER(country_region) = '{country_filter.lower()}'"
-        elif country_code_filter:
-            where = f"WHERE LOWER(country_code) = '{country_code_filter.lower()}'"
-
-        query = f"""
-        SELECT
-          SUM(confirmed) as confirmed,
-          SUM(deaths) as deaths,
-          SUM(recovered) as recovered,
-          last_update,
-          SUM(delta_confirmed) as delta_confirmed,
-          SUM(delta_recovered) as delta_recovered
-        FROM cases_time
-        { where }
-        GROUP BY last_update
-        ORDER BY last_update DESC
-        """
-
-        cursor = db.get_db().cursor()
-        cursor.execute(query)
-
-        result = []
-        for row in cursor.fetchall():
-            (
-                confirmed,
-                deaths,
-                recovered,
-                last_update,
-                delta_confirmed,
-                delta_recovered,
-            ) = row
-
-            result.append({
-                "confirmed": confirmed,
-                "deaths": deaths,
-                "recovered": recovered,
-                "date": last_update,
-                "delta_confirmed": delta_confirmed,
-                "delta_recovered": delta_recovered,
-            })
-
-        return jsonify(result)
-
-    ## Start jobs
-    #covid_importer = CovidImporter()
-    #import_scheduler = BackgroundScheduler()
-    #import_scheduler.add_job(func=covid_importer.scheduled_start, args=[app], trigger="interval", seconds=20)
-    #import_scheduler.start()
-    ## Shut down the scheduler when exiting the app
-    #atexit.register(lambda: import_scheduler.shutdown())
-
+        try:
+            country_filter, country_code_filter = get_list_args()
+            page = queries.Page.from_args(request.args)
+            projection = Projection.from_args(request.args)
+        except ValueError as error:
+            return str(error), 400
+
+        return paginated(
+            queries.get_cases_daily(country_filter, country_code_filter, page, projection), page)
+
+    @app.route('/export/<table_name>')
+    @conditional.conditional_response
+    def export_table(table_name):
+        if table_name not in export.EXPORTS:
+            return "unknown table", 404
+
+        export_format = request.args.get("format") or "csv"
+        if export_format not in export.EXPORT_FORMATS:
+            return f"format must be one of {', '.join(export.EXPORT_FORMATS)}", 400
+
+        try:
+            country_filter, country_code_filter = get_list_args()
+            page = queries.Page.from_args(request.args)
+        except ValueError as error:
+            return str(error), 400
+        # the rows are ordered by country, a date cursor cannot page them
+        if page.cursor is not None:
+            return "cursor is not supported by exports, use since and limit", 400
+
+        chunks = export.export(table_name, export_format, country_filter, country_code_filter, page)
+        response = current_app.response_class(
+            stream_with_context(chunks), mimetype=export.EXPORT_FORMATS[export_format])
+        response.headers["Content-Disposition"] = f"attachment; filename={table_name}.{export_format}"
+        return response
+
+    # Start jobs
+    import_interval = app.config.get("IMPORT_INTERVAL")
+    # import processes create their own app, they must not schedule imports
+    if import_interval and multiprocessing.parent_process() is None:
+        app.extensions["jobs"].schedule(import_interval)
 
     return app
 
@@ -0,0 +1,209 @@
+import os
+import sqlite3
+import threading
+import functools
+from . import db
+from collections import OrderedDict
+from flask import current_app, request
+
+RESPONSE_CACHE_MAX_BYTES = 64 * 1024 * 1024
+# rough size of an entry without its body
+ENTRY_OVERHEAD = 512
+# query parameters whose values are compared case insensitive by the endpoints
+CASE_INSENSITIVE_ARGS = ("country", "code")
+
+class ResponseCache:
+    """ In-process LRU cache of the rendered responses of the read endpoints,
+    limited to max_bytes.
+
+    The data only changes with an import, so the whole cache is invalidated
+    at once by bumping the generation. Responses rendered with data of an
+    older generation are not stored.
+
+    Imports can run in another app or process, so before each request the
+    cache is synced with the id of the last import run in the database. The
+    id is only queried when the database files have changed since the last
+    sync, see get_database_version.
+    """
+
+    def __init__(self, max_bytes=RESPONSE_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.generation = 0
+        self.import_run = None
+        self.database_version = None
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def set(self, key, generation, body: bytes, status, headers):
+        size = len(body) + ENTRY_OVERHEAD
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            if generation != self.generation:
+                return
+
+            if key in self._entries:
+                self._size -= self._entries.pop(key)[3]
+            self._entries[key] = (body, status, headers, size)
+            self._size += size
+
+            while self._size > self.max_bytes:
+                _, (_, _, _, evicted_size) = self._entries.popitem(last=False)
+                self._size -= evicted_size
+                self.evictions += 1
+
+    def invalidate(self, import_run=None):
+        """ Drops all entries, called after each import which changed data.
+        import_run is the id of the import run of the new data, if known.
+        """
+        with self._lock:
+            if import_run is not None:
+                self.import_run = import_run
+            self._clear()
+
+    def sync(self, database_version, get_import_run):
+        """ Invalidates the cache if the id of the last import run differs from
+        the one of the cached data. get_import_run() is only called if
+        database_version differs from the one of the last sync.
+        """
+        if database_version == self.database_version:
+            return
+
+        with self._lock:
+            if database_version == self.database_version:
+                return
+            import_run = get_import_run()
+            self.database_version = database_version
+            if import_run != self.import_run:
+                self.import_run = import_run
+                self._clear()
+
+    def _clear(self):
+        self.generation += 1
+        self._entries.clear()
+        self._size = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "generation": self.generation,
+                "import_run": self.import_run,
+                "entries": len(self._entries),
+                "bytes": self._size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+class ReloadedStore:
+    """ Base of the in-memory copies of imported data. load() is called again
+    on the first use after the response cache was invalidated, i.e. after an
+    import, and its result replaces the old one as a whole.
+    """
+
+    def __init__(self):
+        self.generation = None
+        self._value = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        raise NotImplementedError
+
+    def current(self):
+        generation = get_cache().generation
+        if generation != self.generation:
+            with self._lock:
+                if generation != self.generation:
+                    self._value = self.load()
+                    self.generation = generation
+
+        return self._value
+
+def get_database_version(database):
+    """ Returns the size and modification time of database and its WAL file.
+    Every commit changes one of them, so an unchanged version means that no
+    import has finished since, without a query.
+    """
+    version = []
+    for path in (database, database + "-wal"):
+        try:
+            stat = os.stat(path)
+            version.append((stat.st_size, stat.st_mtime_ns))
+        except OSError:
+            version.append(None)
+    return tuple(version)
+
+def get_last_import_run():
+    """ Returns the id of the last import run in the database, None before the
+    first import or if the database is not migrated yet.
+    """
+    try:
+        return db.get_db().execute("SELECT MAX(id) FROM import_runs").fetchone()[0]
+    except sqlite3.Error:
+        return None
+
+def init_app(app):
+    app.extensions["response_cache"] = ResponseCache(
+        app.config.get("RESPONSE_CACHE_MAX_BYTES", RESPONSE_CACHE_MAX_BYTES)
+    )
+
+    @app.before_request
+    def sync_cache():
+        get_cache().sync(get_database_version(app.config["DATABASE"]), get_last_import_run)
+
+def get_cache() -> ResponseCache:
+    return current_app.extensions["response_cache"]
+
+def invalidate():
+    get_cache().invalidate()
+
+def get_cache_key():
+    """ Returns the route with its sorted query parameters.
+    """
+    args = []
+    for name, value in request.args.items(multi=True):
+        value = value.strip()
+        if name in CASE_INSENSITIVE_ARGS:
+            value = value.lower()
+        args.append((name, value))
+
+    return (request.path, tuple(sorted(args)))
+
+def cached_response(view):
+    """ Serves successful responses of view from the response cache.
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        cache = get_cache()
+        key = get_cache_key()
+        entry = cache.get(key)
+        if entry is not None:
+            body, status, headers, _ = entry
+            return current_app.response_class(body, status=status, headers=headers)
+
+        generation = cache.generation
+        response = current_app.make_response(view(*args, **kwargs))
+        if response.status_code == 200 and not response.is_streamed:
+            cache.set(key, generation, response.get_data(), response.status_code,
+                      list(response.headers.items()))
+
+        return response
+
+    return wrapper
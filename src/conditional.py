@@ -0,0 +1,67 @@
+import datetime
+import functools
+from . import db
+from . import cache
+from flask import current_app, request
+
+CACHE_CONTROL = "public, max-age=300"
+
+class ImportRunState(cache.ReloadedStore):
+    """ Keeps the id and finish time of the last import run in memory. Like
+    the snapshots it is reloaded after the response cache was invalidated,
+    so conditional requests are answered without a database query.
+    """
+
+    def load(self):
+        row = db.get_db().execute(
+            "SELECT id, finished_at FROM import_runs ORDER BY id DESC LIMIT 1"
+        ).fetchone()
+        return None if row is None else (
+            f"import-{row['id']}",
+            datetime.datetime.fromtimestamp(int(row["finished_at"]), datetime.timezone.utc)
+        )
+
+    def get(self):
+        """ Returns (etag, last_modified) of the data or None before the first
+        recorded import.
+        """
+        return self.current()
+
+def init_app(app):
+    app.extensions["import_run"] = ImportRunState()
+
+def get_state() -> ImportRunState:
+    return current_app.extensions["import_run"]
+
+def is_not_modified(etag, last_modified) -> bool:
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    if request.if_modified_since:
+        return last_modified <= request.if_modified_since
+    return False
+
+def conditional_response(view):
+    """ Adds ETag, Last-Modified and Cache-Control of the last import run to
+    successful responses of view and answers conditional requests with 304
+    without calling view.
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        run = get_state().get()
+        if run is None:
+            return view(*args, **kwargs)
+
+        etag, last_modified = run
+        if is_not_modified(etag, last_modified):
+            response = current_app.response_class(status=304)
+        else:
+            response = current_app.make_response(view(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+
+        response.set_etag(etag, weak=True)
+        response.last_modified = last_modified
+        response.headers["Cache-Control"] = current_app.config.get("CACHE_CONTROL", CACHE_CONTROL)
+        return response
+
+    return wrapper
@@ -1,39 +1,362 @@
+import os
+import re
 import sqlite3
+import pathlib
+import time
+import threading
+from contextlib import contextmanager
 
 import click
 from flask import current_app, g
 from flask.cli import with_appcontext
 
 DATABASE = 'database.db'
+MIGRATIONS_FOLDER = 'migrations'
+DB_POOL_SIZE = 32
+DB_MMAP_SIZE = 256 * 1024 * 1024
+DB_STATEMENT_CACHE = 256
+
+class TimedCursor(sqlite3.Cursor):
+    """ Cursor which reports each query with the seconds spent in execute and
+    the fetch calls to on_query(sql, seconds). A query is reported when its
+    rows are exhausted, the cursor executes the next query or is closed.
+    Rows read by iterating the cursor are not timed.
+    """
+    on_query = None
+    _query = None
+    _seconds = 0.0
+
+    def execute(self, sql, parameters=()):
+        return self._execute(super().execute, sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self._execute(super().executemany, sql, seq_of_parameters)
+
+    def _execute(self, execute, sql, parameters):
+        self._finish()
+        start_time = time.perf_counter()
+        try:
+            return execute(sql, parameters)
+        finally:
+            self._query = sql
+            self._seconds = time.perf_counter() - start_time
+            if self.description is None:
+                self._finish()
+
+    def _fetch(self, fetch, *args):
+        start_time = time.perf_counter()
+        try:
+            return fetch(*args)
+        finally:
+            self._seconds += time.perf_counter() - start_time
+
+    def fetchone(self):
+        row = self._fetch(super().fetchone)
+        if row is None:
+            self._finish()
+        return row
+
+    def fetchmany(self, size=None):
+        rows = self._fetch(super().fetchmany, self.arraysize if size is None else size)
+        if not rows:
+            self._finish()
+        return rows
+
+    def fetchall(self):
+        rows = self._fetch(super().fetchall)
+        self._finish()
+        return rows
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def __del__(self):
+        self._finish()
+
+    def _finish(self):
+        if self._query is not None:
+            query, self._query = self._query, None
+            self.on_query(query, self._seconds)
+
+class TimedConnection(sqlite3.Connection):
+    """ Connection whose cursors are TimedCursors reporting to on_query.
+    """
+    on_query = None
+
+    def cursor(self, factory=TimedCursor):
+        cursor = super().cursor(factory)
+        cursor.on_query = self.on_query
+        return cursor
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+def connect(database, on_query=None, **kwargs):
+    """ Returns sqlite3.connect(database, **kwargs), with on_query a
+    TimedConnection which reports the time of each query to it.
+    """
+    if on_query is None:
+        return sqlite3.connect(database, **kwargs)
+
+    connection = sqlite3.connect(database, factory=TimedConnection, **kwargs)
+    connection.on_query = on_query
+    return connection
+
+class ConnectionPool:
+    """ Keeps one long-lived read-only connection per worker thread, so the
+    connect and schema parsing cost is paid once per thread instead of once
+    per request.
+
+    If more than max_size threads hold a connection, additional threads get
+    a connection which is closed at the end of the request (overflow).
+
+    on_query is called with (sql, seconds) of each query, see TimedCursor.
+    """
+
+    def __init__(self, database, max_size=DB_POOL_SIZE, mmap_size=DB_MMAP_SIZE,
+                 statement_cache=DB_STATEMENT_CACHE, on_query=None):
+        self.database = database
+        self.max_size = max_size
+        self.mmap_size = mmap_size
+        self.statement_cache = statement_cache
+        self.on_query = on_query
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections = {}
+        self.opened = 0
+        self.reused = 0
+        self.overflow = 0
+
+    def _connect(self):
+        uri = pathlib.Path(self.database).absolute().as_uri() + '?mode=ro'
+        connection = connect(
+            uri,
+            on_query=self.on_query,
+            uri=True,
+            detect_types=sqlite3.PARSE_DECLTYPES,
+            cached_statements=self.statement_cache,
+            # closed by the pool from other threads, but only used by its own thread
+            check_same_thread=False
+        )
+        connection.row_factory = sqlite3.Row
+        connection.execute(f'PRAGMA mmap_size = {int(self.mmap_size)}')
+        return connection
+
+    def acquire(self):
+        """ Returns (connection, pooled). Connections which are not pooled have
+        to be closed by the caller.
+        """
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None:
+            with self._lock:
+                self.reused += 1
+            return connection, True
+
+        connection = self._connect()
+        with self._lock:
+            self.opened += 1
+            # thread idents are reused, a stored connection belongs to a dead thread
+            stale = self._connections.pop(threading.get_ident(), None)
+            if stale is not None:
+                stale.close()
+            if len(self._connections) >= self.max_size:
+                self._remove_dead_threads()
+            if len(self._connections) >= self.max_size:
+                self.overflow += 1
+                return connection, False
+            self._connections[threading.get_ident()] = connection
+
+        self._local.connection = connection
+        return connection, True
+
+    def _remove_dead_threads(self):
+        alive = {thread.ident for thread in threading.enumerate()}
+        for ident in list(self._connections):
+            if ident not in alive:
+                self._connections.pop(ident).close()
+
+    def close_all(self):
+        with self._lock:
+            for connection in self._connections.values():
+                connection.close()
+            self._connections.clear()
+        self._local = threading.local()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'size': len(self._connections),
+                'max_size': self.max_size,
+                'opened': self.opened,
+                'reused': self.reused,
+                'overflow': self.overflow,
+            }
+
+def get_pool() -> ConnectionPool:
+    return current_app.extensions['db_pool']
 
 def get_db():
+    """ Returns the read-only connection of the current thread.
+    """
     if 'db' not in g:
-        g.db = sqlite3.connect(
+        g.db, g.db_pooled = get_pool().acquire()
+
+    return g.db
+
+def get_writer_db():
+    """ Returns a read-write connection for the importers and migrations. It is
+    separate from the pooled read-only connections and closed after the request.
+    """
+    if 'writer_db' not in g:
+        g.writer_db = connect(
             current_app.config['DATABASE'],
+            on_query=get_pool().on_query,
             detect_types=sqlite3.PARSE_DECLTYPES
         )
-        g.db.row_factory = sqlite3.Row
+        g.writer_db.row_factory = sqlite3.Row
 
-    return g.db
+    return g.writer_db
 
 def close_db(e=None):
    db = g.pop('db', None)
 
-   if db is not None:
+   if db is not None and not g.pop('db_pooled', True):
        db.close()
 
+   writer_db = g.pop('writer_db', None)
+
+   if writer_db is not None:
+       writer_db.close()
+
 def init_app(app):
+    app.extensions['db_pool'] = ConnectionPool(
+        app.config['DATABASE'],
+        max_size=app.config.get('DB_POOL_SIZE', DB_POOL_SIZE),
+        mmap_size=app.config.get('DB_MMAP_SIZE', DB_MMAP_SIZE),
+        statement_cache=app.config.get('DB_STATEMENT_CACHE', DB_STATEMENT_CACHE)
+    )
     app.teardown_appcontext(close_db)
     app.cli.add_command(init_db_command)
+    app.cli.add_command(migrate_db_command)
+
+def get_migrations():
+    """ Returns all (version, file name) tuples of the migrations folder ordered
+    by version. Migration files are named `<version>_<description>.sql`.
+    """
+    folder = os.path.join(current_app.root_path, MIGRATIONS_FOLDER)
+    migrations = []
+    for file_name in os.listdir(folder):
+        re_result = re.match(r'(\d+)_\w+\.sql$', file_name)
+        if re_result:
+            migrations.append((int(re_result.group(1)), file_name))
+
+    return sorted(migrations)
+
+def get_schema_version(db):
+    return db.execute('PRAGMA user_version').fetchone()[0]
+
+def migrate_db():
+    """ Applies all migrations newer than the schema version stored in the
+    database. Each migration runs in its own transaction.
+
+    Returns the list of applied versions.
+    """
+    db = get_writer_db()
+    current_version = get_schema_version(db)
+    applied = []
+
+    for version, file_name in get_migrations():
+        if version <= current_version:
+            continue
+
+        with current_app.open_resource(os.path.join(MIGRATIONS_FOLDER, file_name)) as f:
+            script = f.read().decode('utf8')
+
+        try:
+            db.executescript(f"BEGIN;\n{script}\nPRAGMA user_version = {version};\nCOMMIT;")
+        except sqlite3.Error:
+            db.rollback()
+            raise
+        applied.append(version)
+
+    return applied
 
 def init_db():
-    db = get_db()
-    with current_app.open_resource('schema.sql') as f:
-        db.executescript(f.read().decode('utf8'))
+    db = get_writer_db()
+    tables = db.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'"
+    ).fetchall()
+    for (table_name,) in tables:
+        db.execute(f'DROP TABLE IF EXISTS "{table_name}"')
+    db.execute('PRAGMA user_version = 0')
+    db.commit()
+
+    migrate_db()
+
+@contextmanager
+def transaction(db):
+    """ Runs the block in one transaction, which is rolled back on errors.
+    """
+    if not db.in_transaction:
+        db.execute('BEGIN')
+    try:
+        yield db
+    except BaseException:
+        db.rollback()
+        raise
+    db.commit()
+
+def create_table_like(db, table_name, new_table_name):
+    """ Creates the empty table new_table_name with the declared columns of
+    table_name. Indexes are not copied, they are rebuilt by swap_table.
+    """
+    row = db.execute(
+        "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (table_name,)
+    ).fetchone()
+    if row is None:
+        raise RuntimeError(f"Table {table_name} does not exist, run `flask migrate-db` first.")
+
+    query = re.sub(
+        r'^CREATE TABLE\s+(IF NOT EXISTS\s+)?("[^"]+"|\w+)\s*\(',
+        f'CREATE TABLE {new_table_name} (',
+        row[0],
+        count=1,
+        flags=re.IGNORECASE
+    )
+    db.execute(f"DROP TABLE IF EXISTS {new_table_name}")
+    db.execute(query)
+
+def swap_table(db, new_table_name, table_name):
+    """ Replaces table_name by new_table_name and creates the indexes of
+    table_name on the swapped in table.
+    """
+    indexes = db.execute(
+        "SELECT sql FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL",
+        (table_name,)
+    ).fetchall()
+
+    db.execute(f"DROP TABLE {table_name}")
+    db.execute(f"ALTER TABLE {new_table_name} RENAME TO {table_name}")
+    for (query,) in indexes:
+        db.execute(query)
 
 @click.command('init-db')
 @with_appcontext
 def init_db_command():
     """Clear the existing data and create new tables."""
     init_db()
-    click.echo('Initialized the database.')
\ No newline at end of file
+    click.echo('Initialized the database.')
+
+@click.command('migrate-db')
+@with_appcontext
+def migrate_db_command():
+    """Apply pending schema migrations and keep the existing data."""
+    applied = migrate_db()
+    if applied:
+        click.echo(f'Applied migrations {", ".join(str(v) for v in applied)}.')
+    else:
+        click.echo('Database schema is up to date.')
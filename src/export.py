@@ -0,0 +1,104 @@
+import io
+import csv
+import json
+from . import db
+from . import queries
+from .utils import day_to_iso
+
+# rows fetched from the cursor and written to the response at once
+EXPORT_BATCH = 1000
+
+# exported columns of each table, last_update is converted to ISO dates
+EXPORTS = {
+    "cases_time": [
+        "country_region", "country_code", "last_update", "confirmed", "deaths", "recovered",
+        "delta_confirmed", "delta_recovered", "delta_deaths"
+    ],
+    "cases_total": [
+        "country_region", "country_code", "last_update", "delta_confirmed", "delta_recovered", "delta_deaths"
+    ],
+}
+
+EXPORT_FORMATS = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+}
+
+def get_rows(table_name, countries=None, codes=None, page=None):
+    """ Yields the rows of table_name with the countries countries or the
+    codes codes in batches of EXPORT_BATCH, so the table is never read into
+    memory as a whole. Dates are ISO date strings.
+    """
+    columns = EXPORTS[table_name]
+    page = page or queries.Page()
+    conditions, params = [], []
+    if countries:
+        condition, params = queries.in_filter("country_region", countries)
+        conditions.append(condition)
+    elif codes:
+        condition, params = queries.in_filter("country_code", codes)
+        conditions.append(condition)
+    if page.since is not None:
+        conditions.append("last_update >= ?")
+        params.append(page.since)
+    if page.until is not None:
+        conditions.append("last_update <= ?")
+        params.append(page.until)
+
+    where = "WHERE " + " AND ".join(conditions) if conditions else ""
+    limit = ""
+    if page.limit is not None:
+        limit = "LIMIT ?"
+        params.append(page.limit)
+    cursor = db.get_db().execute(f"""
+    SELECT {", ".join(columns)}
+    FROM {table_name}
+    {where}
+    ORDER BY country_region, last_update
+    {limit}
+    """, params)
+
+    date_index = columns.index("last_update")
+    try:
+        while True:
+            rows = cursor.fetchmany(EXPORT_BATCH)
+            if not rows:
+                break
+            for row in rows:
+                row = list(row)
+                row[date_index] = day_to_iso(row[date_index])
+                yield row
+    finally:
+        cursor.close()
+
+def to_csv(columns, rows):
+    """ Yields the csv lines of rows with a header line, one chunk per batch.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerow(columns)
+    for i, row in enumerate(rows):
+        if i % EXPORT_BATCH == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        writer.writerow(row)
+    yield buffer.getvalue()
+
+def to_ndjson(columns, rows):
+    """ Yields one json object per line, one chunk per batch.
+    """
+    lines = []
+    for row in rows:
+        lines.append(json.dumps(dict(zip(columns, row))))
+        if len(lines) == EXPORT_BATCH:
+            yield "\n".join(lines) + "\n"
+            lines = []
+    if lines:
+        yield "\n".join(lines) + "\n"
+
+def export(table_name, export_format, countries=None, codes=None, page=None):
+    """ Returns a generator of the chunks of table_name in export_format.
+    """
+    encode = to_csv if export_format == "csv" else to_ndjson
+    return encode(EXPORTS[table_name], get_rows(table_name, countries, codes, page))
@@ -0,0 +1,222 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import requests
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
+from requests.adapters import HTTPAdapter
+from typing import Dict, Iterator, Set
+
+FETCH_WORKERS = 8
+FETCH_TIMEOUT = 60
+FETCH_RETRIES = 3
+FETCH_RETRY_BACKOFF = 1
+FETCH_CHUNK_SIZE = 64 * 1024
+
+logger = logging.getLogger('waitress')
+logger.setLevel(logging.INFO)
+
+def create_session(pool_size=FETCH_WORKERS) -> requests.Session:
+    """ Returns a session whose connection pool is shared by all fetch workers.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+class SourceFetcher:
+    """ Downloads all sources of an import in parallel before parsing starts.
+
+    Each source is streamed into a file of the source cache directory, so the
+    parsers read it from disk and never hold a whole source in memory. Next to
+    each file its ETag, Last-Modified and sha256 hash are stored in
+    `<name>.meta.json`, they are used for conditional requests and to detect
+    sources which have not changed since their last import.
+
+    In offline mode no request is made and the cached files are used, so the
+    cache directory can also be filled as a local mirror.
+    """
+
+    def __init__(self, directory, workers=FETCH_WORKERS, timeout=FETCH_TIMEOUT,
+                 retries=FETCH_RETRIES, timeouts: Dict[str, float] = None, offline=False):
+        self.directory = directory
+        self.workers = workers
+        self.timeout = timeout
+        self.timeouts = timeouts or {}
+        self.retries = retries
+        self.offline = offline
+        self.session = create_session(workers)
+        self.paths = {}
+        self.metas = {}
+
+        os.makedirs(self.directory, exist_ok=True)
+
+    @classmethod
+    def from_config(cls):
+        config = current_app.config
+        return cls(
+            config.get("SOURCE_CACHE_DIR") or os.path.join(current_app.instance_path, "source_cache"),
+            workers=config.get("FETCH_WORKERS", FETCH_WORKERS),
+            timeout=config.get("FETCH_TIMEOUT", FETCH_TIMEOUT),
+            retries=config.get("FETCH_RETRIES", FETCH_RETRIES),
+            timeouts=config.get("FETCH_TIMEOUTS"),
+            offline=config.get("IMPORT_OFFLINE", False),
+        )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self.session.close()
+
+    def fetch_all(self, sources: Dict[str, str]) -> Dict[str, str]:
+        """ Downloads all sources ({name: url}) in parallel and returns the
+        local file path of each source. Raises the error of the first failed
+        source after all downloads have finished.
+        """
+        start_time = time.monotonic()
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = {
+                name: executor.submit(self.fetch, name, url) for name, url in sources.items()
+            }
+        for name, future in futures.items():
+            self.paths[name] = future.result()
+
+        logger.info("Fetched %s sources in %s seconds, changed: %s", len(sources),
+                    time.monotonic() - start_time, sorted(self.changed_sources()))
+        return self.paths
+
+    def fetch(self, name, url) -> str:
+        """ Downloads one source, retrying connection errors, timeouts and
+        server errors with an increasing backoff.
+        """
+        timeout = self.timeouts.get(name, self.timeout)
+        path = os.path.join(self.directory, name)
+        meta = self._load_meta(name)
+        self.metas[name] = meta
+
+        if self.offline:
+            if not os.path.exists(path):
+                raise FileNotFoundError(f"Source {name} is not in the source cache {self.directory}")
+            # mirrored files are replaced without updating their meta
+            stat = os.stat(path)
+            if ("sha256" not in meta or meta.get("size") != stat.st_size
+                    or meta.get("mtime") != stat.st_mtime_ns):
+                meta.update({
+                    "sha256": self._hash_file(path),
+                    "size": stat.st_size,
+                    "mtime": stat.st_mtime_ns,
+                })
+                self._save_meta(name, meta)
+            return path
+
+        for attempt in range(self.retries + 1):
+            try:
+                self._download(name, url, path, meta, timeout)
+                return path
+            except (requests.ConnectionError, requests.Timeout,
+                    requests.exceptions.ChunkedEncodingError) as error:
+                last_error = error
+            except requests.HTTPError as error:
+                if error.response.status_code < 500:
+                    raise
+                last_error = error
+
+            logger.warning("Fetching %s failed (attempt %s): %s", name, attempt + 1, last_error)
+            if attempt < self.retries:
+                time.sleep(FETCH_RETRY_BACKOFF * 2 ** attempt)
+
+        raise last_error
+
+    def _download(self, name, url, path, meta, timeout):
+        """ Streams url into path with a conditional request. timeout is the
+        limit for the whole download, not only for connecting.
+        """
+        headers = {}
+        if os.path.exists(path) and meta.get("url") == url:
+            if meta.get("etag"):
+                headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                headers["If-Modified-Since"] = meta["last_modified"]
+
+        deadline = time.monotonic() + timeout
+        size = 0
+        sha256 = hashlib.sha256()
+        with self.session.get(url, headers=headers, stream=True, timeout=timeout) as response:
+            if response.status_code == 304:
+                logger.info("Source %s not modified at %s", name, url)
+                return
+
+            response.raise_for_status()
+            with open(path + ".part", "wb") as f:
+                for chunk in response.iter_content(chunk_size=FETCH_CHUNK_SIZE):
+                    if time.monotonic() > deadline:
+                        raise requests.Timeout(f"Download of {url} exceeded {timeout} seconds")
+                    f.write(chunk)
+                    sha256.update(chunk)
+                    size += len(chunk)
+
+        os.replace(path + ".part", path)
+        meta.update({
+            "url": url,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "sha256": sha256.hexdigest(),
+            "fetched_at": time.time(),
+        })
+        self._save_meta(name, meta)
+        logger.info("Fetched %s (%s bytes) from %s", name, size, url)
+
+    def changed_sources(self) -> Set[str]:
+        """ Returns the names of all fetched sources whose content differs from
+        their last import.
+        """
+        return {
+            name for name, meta in self.metas.items()
+            if meta.get("sha256") != meta.get("imported_sha256")
+        }
+
+    def mark_imported(self, names=None):
+        """ Remembers the current content of the sources (default: all fetched
+        sources) as imported.
+        """
+        for name in names or list(self.metas):
+            meta = self.metas[name]
+            meta["imported_sha256"] = meta.get("sha256")
+            self._save_meta(name, meta)
+
+    def _load_meta(self, name) -> dict:
+        try:
+            with open(os.path.join(self.directory, name + ".meta.json"), encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def _save_meta(self, name, meta):
+        path = os.path.join(self.directory, name + ".meta.json")
+        with open(path + ".part", "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=2)
+        os.replace(path + ".part", path)
+
+    def _hash_file(self, path) -> str:
+        sha256 = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(FETCH_CHUNK_SIZE), b""):
+                sha256.update(chunk)
+        return sha256.hexdigest()
+
+    def open_lines(self, name) -> Iterator[str]:
+        """ Returns the decoded lines of a fetched source for csv.reader.
+        """
+        with open(self.paths[name], encoding="utf-8", newline="") as f:
+            yield from f
+
+    def load_json(self, name):
+        with open(self.paths[name], encoding="utf-8") as f:
+            return json.load(f)
@@ -0,0 +1,76 @@
+FORMATS = ("records", "columnar")
+
+class Projection:
+    """ Field projection (`fields=`) and response format (`format=`) of a
+    request. In the columnar format a list of records is returned as one
+    list per field, e.g. `{"date": [...], "confirmed": [...]}`.
+    """
+
+    def __init__(self, fields=None, columnar=False):
+        self.fields = fields
+        self.columnar = columnar
+
+    @classmethod
+    def from_args(cls, args):
+        """ Returns the projection of the query parameters fields (comma
+        separated) and format. Raises ValueError on an unknown format.
+        """
+        fields = [field.strip() for field in args.get("fields", "").split(",") if field.strip()]
+        response_format = args.get("format") or "records"
+        if response_format not in FORMATS:
+            raise ValueError(f"format must be one of {', '.join(FORMATS)}")
+
+        return cls(fields or None, response_format == "columnar")
+
+    def select(self, names) -> list:
+        """ Returns the projected names of names.
+        """
+        if self.fields is None:
+            return list(names)
+        return [name for name in names if name in self.fields]
+
+    def record(self, record: dict) -> dict:
+        """ Returns the projected fields of record. Nested records (e.g. the
+        country of a case) are kept if their key is projected, otherwise their
+        own fields are projected and they are dropped if none is left.
+        """
+        if self.fields is None:
+            return record
+
+        result = {}
+        for key, value in record.items():
+            if key in self.fields:
+                result[key] = value
+            elif isinstance(value, dict):
+                value = self.record(value)
+                if value:
+                    result[key] = value
+        return result
+
+    def records(self, records: list):
+        """ Returns the projected records, in the columnar format nested
+        records are flattened into columns.
+        """
+        records = [self.record(record) for record in records]
+        if not self.columnar:
+            return records
+
+        columns = {}
+        for record in records:
+            for key, value in flatten(record):
+                columns.setdefault(key, []).append(value)
+        return columns
+
+    def columns(self, columns: dict):
+        """ Returns a timeline given as columns in the requested format.
+        """
+        if self.columnar:
+            return columns
+        return [dict(zip(columns, values)) for values in zip(*columns.values())]
+
+def flatten(record: dict):
+    for key, value in record.items():
+        if isinstance(value, dict):
+            yield from flatten(value)
+        else:
+            yield key, value
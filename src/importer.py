@@ -1,11 +1,14 @@
 import re
-import json
 import csv
-import requests
 import time
 import logging
+import numpy as np
 from . import db
-from .utils import map_date
+from . import cache
+from . import snapshots
+from .fetch import SourceFetcher
+from .loader import BulkLoader
+from .utils import map_day, parse_int, normalize_country_name
 from flask import current_app
 from pydash import get, set_
 from typing import Dict
@@ -14,30 +17,82 @@ COVID_MASTER_BASE_URL = "https://raw.githubusercontent.com/CSSEGISandData/COVID-
 COUNTRY_LUT_URL = "https://raw.githubusercontent.com/CSSEGISandData/COVID-19/master/csse_covid_19_data/UID_ISO_FIPS_LookUp_Table.csv"
 CSV_BASE_URL = "https://raw.githubusercontent.com/CSSEGISandData/COVID-19/web-data/data/"
 COUNTRY_JSON_BASE_URL = "https://raw.githubusercontent.com/samayo/country-json/master/src/"
-INSERT_BATCH = 100
-UPDATE_BATCH = 500
+IMPORT_REVISION_DAYS = 7
+MASTER_TIMESERIES = ["confirmed", "deaths", "recovered"]
+# (table, query) of the rollups rebuilt after each covid import
+ROLLUPS = [
+    ("cases_total_worldwide", """
+    SELECT MAX(ct.last_update), SUM(cc.confirmed), SUM(cc.deaths), SUM(cc.recovered),
+        SUM(ct.delta_confirmed), SUM(ct.delta_recovered), SUM(ct.delta_deaths)
+    FROM cases_total ct
+    JOIN cases_country cc ON ct.country_code = cc.country_code
+    """),
+]
+# (csv column, table column, parser) of the stored columns of the web-data csv
+# tables, country_code is added from the iso3 code
+CSV_COLUMNS = {
+    "cases_time": [
+        ("Country_Region", "country_region", str),
+        ("Last_Update", "last_update", map_day),
+        ("Confirmed", "confirmed", parse_int),
+        ("Deaths", "deaths", parse_int),
+        ("Recovered", "recovered", parse_int),
+        ("Delta_Confirmed", "delta_confirmed", parse_int),
+        ("Delta_Recovered", "delta_recovered", parse_int),
+    ],
+    "cases_country": [
+        ("Country_Region", "country_region", str),
+        ("Confirmed", "confirmed", parse_int),
+        ("Deaths", "deaths", parse_int),
+        ("Recovered", "recovered", parse_int),
+        ("Active", "active", parse_int),
+    ],
+}
+COUNTRY_JSON_BASE_FILE = "country-by-abbreviation.json"
+# (file name, key of the value in the file, column of countries)
+COUNTRY_ATTRIBUTES = [
+    ("country-by-population.json", "population", "population"),
+    ("country-by-life-expectancy.json", "expectancy", "life_expectancy"),
+    ("country-by-continent.json", "continent", "continent"),
+    ("country-by-capital-city.json", "city", "capital"),
+    ("country-by-population-density.json", "density", "population_density"),
+    ("country-by-yearly-average-temperature.json", "temperature", "avg_temperature"),
+]
+COUNTRY_JSON_FILES = [COUNTRY_JSON_BASE_FILE] + [file_name for file_name, _, _ in COUNTRY_ATTRIBUTES]
 
 logger = logging.getLogger('waitress')
 logger.setLevel(logging.INFO)
 
-def do_bulk_insert(table_name, data, header):
-    # Replace empty strings with None.
-    data = tuple(x if x else None for x in data)
-    placeholder = ["?" for i in range(len(header))]
-    query = f'INSERT INTO {table_name} ({",".join(header).lower()}) VALUES ({",".join(placeholder)})'
-    db.get_db().executemany(query, data)
-    db.get_db().commit()
+def report_nothing(phase, row_count=0):
+    pass
+
+def record_import_run(importer_name, datasets, started_at):
+    """ Stores an import run which changed data. The last run versions the
+    responses of the api (ETag, Last-Modified).
+    """
+    connection = db.get_writer_db()
+    with db.transaction(connection):
+        connection.execute(
+            "INSERT INTO import_runs (importer, datasets, started_at, finished_at) VALUES (?, ?, ?, ?)",
+            (importer_name, ",".join(datasets), started_at, time.time())
+        )
 
 class CovidImporter:
 
-    def __init__(self):
-        self.init_lookup_table()
+    def __init__(self, force=False, full=False, progress=None):
+        """ force: import all datasets, even if their sources have not changed.
+        full: rebuild cases_time instead of the incremental import.
+        progress: called with (phase, row_count) after each import stage.
+        """
+        self.force = force or full
+        self.full = full
+        self.progress = progress or report_nothing
+        self.country_lookup = {}
+        self.country_lookup_iso3 = {}
 
-    def init_lookup_table(self):
-        data = self._download_csv(COUNTRY_LUT_URL)
+    def init_lookup_table(self, data):
         cr = csv.reader(data, delimiter=',', quotechar='"')
         count = 0
-        result = []
 
         self.country_lookup = {}
         self.country_lookup_iso3 = {}
@@ -74,384 +129,398 @@ class CovidImporter:
             return self.country_lookup_iso3[iso3]
         return None
 
-    def _read_and_import_csv(self, data, table_name):
-        """ Import all data. no delta import.
+    def _parse_covid_csv(self, data, table_name):
+        """ Returns the columns of table_name (including country_code) and a
+        generator of all country rows of a web-data csv, parsed by the
+        parsers of CSV_COLUMNS.
         """
         cr = csv.reader(data, delimiter=',', quotechar='"')
-        count = 0
-        result = []
-        insert_data = []
-        header = None
-        additional_headers = ["country_code"]
+        columns = CSV_COLUMNS[table_name]
+
+        # CSV Header
+        csv_header = next(cr)
+        header = [column for _, column, _ in columns] + ["country_code"]
+        indexes = [csv_header.index(csv_column) for csv_column, _, _ in columns]
+        parsers = [parser for _, _, parser in columns]
+        index_province = csv_header.index("Province_State") if "Province_State" in csv_header else None
+        index_last_update = header.index("last_update") if "last_update" in header else None
+        try:
+            index_iso3 = csv_header.index("ISO3")
+        except ValueError:
+            index_iso3 = csv_header.index("iso3")
+
+        def rows():
+            for row in cr:
+                if len(row) != len(csv_header):
+                    continue
 
-        temp_table_name = table_name + "_new"
+                if index_province is not None and row[index_province] != "":
+                    continue
 
-        for row in cr:
-            count += 1
-            if count == 1:
-                # CSV Header
-                header = row
-                header = header + additional_headers
-                # Delete all data
-                query = f"DROP TABLE IF EXISTS {temp_table_name}"
-                db.get_db().execute(query)
-                query = f"CREATE TABLE {temp_table_name} AS SELECT * FROM {table_name} WHERE 0"
-                db.get_db().execute(query)
-                index_last_update = "Last_Update" in header and header.index(
-                    "Last_Update") or False
+                parsed_row = [parser(row[index]) for index, parser in zip(indexes, parsers)]
+                # like the bulk loader, countries without code get NULL, so
+                # they never conflict on the key of the incremental import
+                parsed_row.append(self._get_country_code_by_iso3(row[index_iso3]) or None)
 
-                index_country_region = header.index("Country_Region")
-                index_province = "Province_State" in header and  header.index(
-                    "Province_State") or False
-                try:
-                    index_iso3 = header.index("ISO3")
-                except ValueError:
-                    index_iso3 = header.index("iso3")
+                if index_last_update is not None and parsed_row[index_last_update] is None:
+                    continue
 
-                indices = {}
-                for index, name in enumerate(header):
-                    indices[name] = index
+                yield parsed_row
 
-                continue
+        return header, rows()
 
-            if len(row) != len(header)-len(additional_headers):
-                continue
+    def _read_and_import_csv(self, data, table_name):
+        """ Import all data. no delta import.
 
-            # handle date dd/mm/yy
-            if index_last_update is not False:
-                row[index_last_update] = map_date(row[index_last_update])
+        Returns the number of imported rows.
+        """
+        header, rows = self._parse_covid_csv(data, table_name)
+        return self.loader.replace_table(table_name, header, rows)
 
-            row.append(self._get_country_code_by_iso3(row[index_iso3]))
+    def _upsert_cases_time(self, data):
+        """ Incremental import of cases_time keyed on (country_code, last_update).
 
-            if index_province and row[index_province] != "":
-                continue
+        Rows older than IMPORT_REVISION_DAYS before the latest stored date are
+        skipped. All newer rows are inserted, or updated if they differ from the
+        stored row, in one transaction. The counts of MASTER_TIMESERIES are
+        merged into cases_time after the upsert, so they are only written by
+        inserts and not compared.
 
-            insert_data.append(tuple(row))
-            if count % INSERT_BATCH == 0:
-                do_bulk_insert(temp_table_name, insert_data, header)
-                insert_data = []
+        Returns the number of written rows.
+        """
+        connection = db.get_writer_db()
+        latest = connection.execute("SELECT MAX(last_update) FROM cases_time").fetchone()[0]
+        revision_days = current_app.config.get("IMPORT_REVISION_DAYS", IMPORT_REVISION_DAYS)
+        since = latest - revision_days
+
+        header, rows = self._parse_covid_csv(data, "cases_time")
+        index_last_update = header.index("last_update")
+        columns = header
+        merged_columns = MASTER_TIMESERIES + [f"delta_{name}" for name in MASTER_TIMESERIES]
+        update_columns = [
+            column for column in columns if column not in ["country_code", "last_update"] + merged_columns
+        ]
+        query = f"""
+        INSERT INTO cases_time ({",".join(columns)}) VALUES ({",".join("?" * len(columns))})
+        ON CONFLICT (country_code, last_update) DO UPDATE SET
+          {", ".join(f"{column} = excluded.{column}" for column in update_columns)}
+        WHERE {" OR ".join(f"cases_time.{column} IS NOT excluded.{column}" for column in update_columns)}
+        """
+        recent_rows = (row for row in rows if row[index_last_update] >= since)
 
-            result.append(row)
+        with db.transaction(connection):
+            # Rows without country code never conflict, so they are replaced.
+            connection.execute(
+                "DELETE FROM cases_time WHERE country_code IS NULL AND last_update >= ?", (since,))
+            cursor = connection.executemany(query, recent_rows)
 
-        if insert_data:
-            do_bulk_insert(temp_table_name, insert_data, header)
+        return cursor.rowcount
 
-        query = f"DROP TABLE {table_name}"
-        db.get_db().execute(query)
-        query = f"ALTER TABLE {temp_table_name} RENAME TO {table_name}"
-        db.get_db().execute(query)
+    def _has_rows(self, table_name) -> bool:
+        return db.get_writer_db().execute(f"SELECT 1 FROM {table_name} LIMIT 1").fetchone() is not None
 
-        return result
+    def _import_cases_total(self):
+        """ Builds cases_total from the latest row of each country in cases_time.
+        delta_deaths is the difference to the deaths of the day before.
 
-    def _read_and_import_cases_total(self, data):
-        """ Import all data. no delta import.
+        Returns the number of imported rows.
         """
-        cr = csv.reader(data, delimiter=',', quotechar='"')
-        count = 0
-        result = []
-        insert_data = []
-        header = None
         table_name = "cases_total"
-
         temp_table_name = table_name + "_new"
+        connection = db.get_writer_db()
 
-        last_country: str = None
-        last_deaths: int = 0
-        last_row: list = None
-
-        additional_headers = ["Delta_Deaths", "country_code"]
-
-        for row in cr:
-            count += 1
-            if count == 1:
-                # CSV Header
-                header = row
-                header = header + additional_headers
-                # Delete all data
-                query = f"DROP TABLE IF EXISTS {temp_table_name}"
-                db.get_db().execute(query)
-                query = f"CREATE TABLE {temp_table_name} AS SELECT * FROM {table_name} WHERE 0"
-                db.get_db().execute(query)
-                index_last_update = "Last_Update" in header and header.index(
-                    "Last_Update")
-                country_index = "Country_Region" in header and header.index(
-                    "Country_Region")
-                deaths_index = "Deaths" in header and header.index("Deaths")
-                index_iso3 = header.index("iso3")
-                index_province = header.index("Province_State")
-
-                continue
-
-            if len(row) != len(header)-len(additional_headers):
-                continue
-
-            if row[index_province] != "":
-                continue
-
-            current_country = row[country_index]
-            current_deaths = int(row[deaths_index])
-
-            # Assumption: List is ordered by countries and dates, so each time the country
-            # changes we have got the latest record of a country in the record before.
-            if last_row and last_country != current_country:
-                last_row[index_last_update] = map_date(row[index_last_update])
-                insert_data.append(tuple(last_row))
-                last_deaths = 0
-
-            # Save row data for next loop run
-            row.append(current_deaths-last_deaths)
-            row.append(self._get_country_code_by_iso3(row[index_iso3]))
-            last_deaths = current_deaths
-            last_country = current_country
-            last_row = row
-
-            if len(insert_data) % INSERT_BATCH == 0:
-                do_bulk_insert(temp_table_name, insert_data, header)
-                insert_data = []
-
-            result.append(row)
-
-        last_row[index_last_update] = map_date(last_row[index_last_update])
-        insert_data.append(last_row)
-        do_bulk_insert(temp_table_name, insert_data, header)
+        time_columns = [row["name"] for row in connection.execute("PRAGMA table_info(cases_time)")]
+        columns = [
+            row["name"] for row in connection.execute(f"PRAGMA table_info({table_name})")
+            if row["name"] in time_columns and row["name"] != "delta_deaths"
+        ]
 
-        query = f"DROP TABLE {table_name}"
-        db.get_db().execute(query)
-        query = f"ALTER TABLE {temp_table_name} RENAME TO {table_name}"
-        db.get_db().execute(query)
+        with db.transaction(connection):
+            db.create_table_like(connection, table_name, temp_table_name)
+            cursor = connection.execute(f"""
+            INSERT INTO {temp_table_name} ({",".join(columns)}, delta_deaths)
+            SELECT {",".join(columns)}, delta_deaths_of_day
+            FROM (
+                SELECT
+                    *,
+                    deaths - LAG(deaths, 1, 0) OVER (
+                        PARTITION BY country_region ORDER BY last_update
+                    ) AS delta_deaths_of_day,
+                    ROW_NUMBER() OVER (
+                        PARTITION BY country_region ORDER BY last_update DESC
+                    ) AS day_number
+                FROM cases_time
+            )
+            WHERE day_number = 1
+            """)
+            row_count = cursor.rowcount
+            db.swap_table(connection, temp_table_name, table_name)
 
-        return result
+        return row_count
 
     def _read_and_import_master_timeseries(self, dataset_name, data):
         """Imports timeseries data from master branch. either confirmed, deaths or
-        recovered and updated the cases_time table.
+        recovered and updates the cases_time and cases_total table.
+
+        The wide csv (one column per date) is read into a matrix of rows by
+        dates. Deltas are the positive differences along the date axis. If a
+        country has a row without province, this row is used, otherwise all
+        provinces are summed up. The country matrices are written to the
+        staging table master_timeseries_country and merged with one UPDATE
+        per table.
         """
-
-        def do_bulk_update(data):
-            query = f"""
-            UPDATE cases_time
-              SET {dataset_name} = ?,
-              delta_{dataset_name} = ?
-            WHERE country_region = ?
-              AND last_update =  ?
-            """
-            db.get_db().executemany(query, data)
-            db.get_db().commit()
-
-        def update_cases_total(data):
-            query = f"UPDATE cases_total SET delta_{dataset_name} = ? where country_region = ?"
-            db.get_db().executemany(query, data)
-            db.get_db().commit()
+        if dataset_name not in MASTER_TIMESERIES:
+            raise ValueError(f"Unknown master timeseries {dataset_name}")
 
         cr = csv.reader(data, delimiter=',', quotechar='"')
-        row_count = 0
-        result = []
-        insert_data = []
-        cases_total_data = []
-        header = None
-        time_table_name = "cases_time"
-        additional_headers = []
-
-        countries_with_province = {}
-
-        last_country = None
-        for row in cr:
-            row_count += 1
-            if row_count == 1:
-                # CSV Header
-                header = row
-                header = header + additional_headers
-                index_country = header.index("Country/Region")
-                index_province = header.index("Province/State")
-                continue
-
-            if len(row) != len(header)-len(additional_headers):
-                continue
-
-            current_country = row[index_country]
-            current_province = row[index_province]
-
-            last_value = 0
-            last_country = None
-            last_province = None
-            # for each country iterate through all datesl
-            for index, column in enumerate(header): 
-                date = map_date(column)
-
-                # not a date column, continue
-                if not date:
-                    continue
-
-                current_value = int(row[index])
-                # only use positive deltas.
-                delta = max(current_value - last_value, 0) 
-
-                last_value = current_value
-                # if no province is set, we know we can store the data for the country.
-                if current_province == "":
-                    # check if in province list and remove it otherwise
-                    if current_country in countries_with_province:
-                        del countries_with_province[current_country]
+        header = next(cr)
+        index_country = header.index("Country/Region")
+        index_province = header.index("Province/State")
+        # (index, date) of all date columns
+        date_columns = [
+            (index, map_day(column)) for index, column in enumerate(header) if map_day(column) is not None
+        ]
+        date_indexes = [index for index, _ in date_columns]
+        dates = np.array([date for _, date in date_columns], dtype=np.int64)
+
+        rows = [row for row in cr if len(row) == len(header)]
+        country_names = np.array([row[index_country] for row in rows], dtype=object)
+        provinces = np.array([row[index_province] for row in rows], dtype=object)
+        values = np.array(
+            [[row[index] for index in date_indexes] for row in rows], dtype=np.int64
+        ).reshape(len(rows), len(date_indexes))
+        # only use positive deltas.
+        deltas = np.clip(np.diff(values, axis=1, prepend=0), 0, None)
+
+        without_province = provinces == ""
+        used = without_province | ~np.isin(country_names, country_names[without_province])
+        countries, country_ids = np.unique(country_names[used], return_inverse=True)
+        country_values = np.zeros((len(countries), len(dates)), dtype=np.int64)
+        country_deltas = np.zeros((len(countries), len(dates)), dtype=np.int64)
+        np.add.at(country_values, country_ids, values[used])
+        np.add.at(country_deltas, country_ids, deltas[used])
+
+        staged_rows = zip(
+            np.repeat(countries, len(dates)).tolist(),
+            np.tile(dates, len(countries)).tolist(),
+            country_values.ravel().tolist(),
+            country_deltas.ravel().tolist(),
+        )
+
+        connection = db.get_writer_db()
+        with db.transaction(connection):
+            connection.execute("DROP TABLE IF EXISTS temp.master_timeseries_country")
+            connection.execute("""
+            CREATE TEMP TABLE master_timeseries_country (
+                country_region TEXT,
+                last_update INTEGER,
+                value INTEGER,
+                delta INTEGER,
+                PRIMARY KEY (country_region, last_update)
+            )
+            """)
+            connection.executemany(
+                "INSERT INTO temp.master_timeseries_country VALUES (?, ?, ?, ?)", staged_rows)
 
-                    insert_data.append((current_value, delta, current_country, date))
-                else:
-                    # sum up delta for all provinces
-                    countries_with_province[current_country] = countries_with_province.get(current_country, {})
-                    countries_with_province[current_country][date] = (
-                        countries_with_province[current_country].get(date, {})
-                    )
-                    countries_with_province[current_country][date]["delta"] = (
-                        countries_with_province[current_country][date].get("delta", 0) + delta
-                    )
-                    countries_with_province[current_country][date]["value"] = (
-                        countries_with_province[current_country][date].get("value", 0) + current_value
-                    )
-
-            # For latest dataset update cases_total with delta
-            if current_province == "":
-                cases_total_data.append((delta, current_country))
-
-            if insert_data and len(insert_data) % UPDATE_BATCH == 0:
-                do_bulk_update(insert_data)
-                update_cases_total(cases_total_data)
-                cases_total_data = []
-                insert_data = []
-
-        # iterate through all non processed countries with provinces
-        for country in countries_with_province:
-            for date in countries_with_province.get(country):
-                delta = countries_with_province.get(country).get(date, {}).get("delta")
-                value = countries_with_province.get(country).get(date, {}).get("value")
-                insert_data.append((value, delta, country, date))
-
-            # update cases_total as well with latest delta
-            cases_total_data.append((delta, country))
-
-        if insert_data:
-            do_bulk_update(insert_data)
-            update_cases_total((cases_total_data))
-
-        return result
-
-    def _download_csv(self, url) -> list:
-        """ Downloads csv from given url and returns it as decoded list.
+            cursor = connection.execute(f"""
+            UPDATE cases_time
+              SET {dataset_name} = s.value,
+              delta_{dataset_name} = s.delta
+            FROM temp.master_timeseries_country s
+            WHERE cases_time.country_region = s.country_region
+              AND cases_time.last_update = s.last_update
+              AND (cases_time.{dataset_name} IS NOT s.value OR cases_time.delta_{dataset_name} IS NOT s.delta)
+            """)
+            row_count = cursor.rowcount
+
+            # cases_total gets the delta of the latest date
+            connection.execute(f"""
+            UPDATE cases_total
+              SET delta_{dataset_name} = s.delta
+            FROM temp.master_timeseries_country s
+            WHERE cases_total.country_region = s.country_region
+              AND s.last_update = (SELECT MAX(last_update) FROM temp.master_timeseries_country)
+            """)
+
+        connection.execute("DROP TABLE temp.master_timeseries_country")
+
+        return row_count
+
+    def _build_rollups(self):
+        """ Rebuilds the precomputed daily series and worldwide totals, so the
+        endpoints do not aggregate cases_time on every request.
         """
-        download = requests.get(url)
-        decoded_content = download.content.decode('utf-8')
-        return decoded_content.split("\n")
-
-    def _download_covid_csv(self, name) -> list:
-        """ Downloads csv from covid19 data source and returns it as decoded list.
+        connection = db.get_writer_db()
+        with db.transaction(connection):
+            for table_name, query in ROLLUPS:
+                connection.execute(f"DELETE FROM {table_name}")
+                connection.execute(f"INSERT INTO {table_name} {query}")
+
+    def _sources(self) -> Dict[str, str]:
+        """ Returns the urls of all sources by name. The base urls can be
+        overridden in the app config, e.g. to import from a local mirror.
         """
-        return self._download_csv(CSV_BASE_URL + name)
+        config = current_app.config
+        csv_base_url = config.get("CSV_BASE_URL", CSV_BASE_URL)
+        master_base_url = config.get("COVID_MASTER_BASE_URL", COVID_MASTER_BASE_URL)
+
+        sources = {
+            "lookup_table": config.get("COUNTRY_LUT_URL", COUNTRY_LUT_URL),
+            "cases_time": csv_base_url + "cases_time.csv",
+            "cases_country": csv_base_url + "cases_country.csv",
+        }
+        for dataset_name in MASTER_TIMESERIES:
+            sources[dataset_name] = (
+                master_base_url + f"time_series_covid19_{dataset_name}_global.csv"
+            )
+
+        return sources
 
-    def _download_and_import_covid_csv(self, name):
-        data = self._download_covid_csv(name + ".csv")
-        result = self._read_and_import_csv(data, name)
-        current_app.logger.info("Imported %s entries for %s", len(result), name)
+    def _import_covid_csv(self, fetcher, name):
+        row_count = self._read_and_import_csv(fetcher.open_lines(name), name)
+        current_app.logger.info("Imported %s entries for %s", row_count, name)
 
-        return data
+        return row_count
 
     def start(self):
+        started_at = time.time()
         start_time = time.monotonic()
         current_app.logger.info("Running import of covid 19 data.")
+        self.loader = BulkLoader.from_config()
+
+        imported = []
+        with SourceFetcher.from_config() as fetcher:
+            self.progress("fetch")
+            fetcher.fetch_all(self._sources())
+            changed = set(self._sources()) if self.force else fetcher.changed_sources()
+
+            # cases_time is rebuilt on a new lookup table as well, since its
+            # country codes might have changed. Rebuilding cases_time resets
+            # all merged master timeseries, so they have to be merged again.
+            import_cases_time = bool(changed & {"lookup_table", "cases_time"})
+            import_cases_country = bool(changed & {"lookup_table", "cases_country"})
+
+            if import_cases_time or import_cases_country:
+                self.init_lookup_table(fetcher.open_lines("lookup_table"))
+
+            if import_cases_time:
+                if self.full or "lookup_table" in changed or not self._has_rows("cases_time"):
+                    row_count = self._import_covid_csv(fetcher, "cases_time")
+                else:
+                    row_count = self._upsert_cases_time(fetcher.open_lines("cases_time"))
+                    current_app.logger.info("Upserted %s entries for cases_time", row_count)
+                self.progress("cases_time", row_count)
+                row_count = self._import_cases_total()
+                current_app.logger.info("Imported %s entries for cases_total", row_count)
+                self.progress("cases_total", row_count)
+                imported += ["cases_time", "cases_total"]
+
+            if import_cases_country:
+                row_count = self._import_covid_csv(fetcher, "cases_country")
+                self.progress("cases_country", row_count)
+                imported.append("cases_country")
+
+            for dataset_name in MASTER_TIMESERIES:
+                if not import_cases_time and dataset_name not in changed:
+                    continue
+
+                row_count = self._read_and_import_master_timeseries(
+                    dataset_name, fetcher.open_lines(dataset_name))
+                current_app.logger.info("Merged %s entries of %s timeseries", row_count, dataset_name)
+                self.progress(dataset_name, row_count)
+                imported.append(dataset_name)
 
-        data = self._download_and_import_covid_csv("cases_time")
-        self._read_and_import_cases_total(data)
-        self._download_and_import_covid_csv("cases_country")
+            if imported:
+                self._build_rollups()
+                self.progress("rollups")
+                # the snapshots are rendered from the time series of this process
+                cache.invalidate()
+                snapshots.build_snapshots()
+                self.progress("snapshots")
+                record_import_run("covid", imported, started_at)
 
-        data = self._download_csv(COVID_MASTER_BASE_URL + "time_series_covid19_recovered_global.csv")
-        self._read_and_import_master_timeseries("recovered", data)
+            fetcher.mark_imported()
+
+        if not imported:
+            current_app.logger.info("No source has changed since the last import.")
 
         current_app.logger.info("Import finished in %s seconds",
                                 time.monotonic() - start_time)
 
-    def scheduled_start(self, app):
-        """ called by ap backgroundscheduler
-        """
-        with app.app_context():
-            db.init_app(app)
-            self.start()
+        return imported
 
 class CountryImporter:
 
-    def _download_country_json(self, name) -> list:
-        """ Downloads country json and returns it as string.
+    def __init__(self, force=False, progress=None):
+        """ force: import the countries, even if no source has changed.
+        progress: called with (phase, row_count) after each import stage.
         """
-        download = requests.get(COUNTRY_JSON_BASE_URL + name)
-        decoded_content = download.content.decode('utf-8')
-        return json.loads(decoded_content)
-
-    def _import_country_data(self):
-        countries = self._download_country_json("country-by-abbreviation.json")
-        population_list = self._download_country_json("country-by-population.json")
-        life_expectancy = self._download_country_json("country-by-life-expectancy.json")
-        continents = self._download_country_json("country-by-continent.json")
-        capital_cities = self._download_country_json("country-by-capital-city.json")
-        population_density = self._download_country_json(
-            "country-by-population-density.json")
-        avg_temperature = self._download_country_json(
-            "country-by-yearly-average-temperature.json")
-
-        query = f"DELETE FROM countries"
-        db.get_db().execute(query)
-
-        data = []
-        result = []
-        count = 0
-        dbPropertyMapping = [
-            "code",
-            "name",
-            "population",
-            "life_expectancy",
-            "continent",
-            "capital",
-            "population_density",
-            "avg_temperature"
-        ]
-
-        for country in countries:
-            population_obj = next((x for x in population_list if x.get(
-                "country") == country.get("country")), {})
-            life_expectancy_obj = next(
-                (x for x in life_expectancy if x.get("country") == country.get("country")), {})
-            continents_obj = next((x for x in continents if x.get(
-                "country") == country.get("country")), {})
-            capital_cities_obj = next(
-                (x for x in capital_cities if x.get("country") == country.get("country")), {})
-            population_density_obj = next((x for x in population_density if x.get(
-                "country") == country.get("country")), {})
-            avg_temperature_obj = next(
-                (x for x in avg_temperature if x.get("country") == country.get("country")), {})
-
-            obj = (
-                country.get("abbreviation"),
-                country.get("country"),
-                population_obj.get("population"),
-                life_expectancy_obj.get("expectancy"),
-                continents_obj.get("continent"),
-                capital_cities_obj.get("city"),
-                population_density_obj.get("density"),
-                avg_temperature_obj.get("temperature")
-            )
+        self.force = force
+        self.progress = progress or report_nothing
 
-            data.append(obj)
-            result.append(obj)
+    def _sources(self) -> Dict[str, str]:
+        base_url = current_app.config.get("COUNTRY_JSON_BASE_URL", COUNTRY_JSON_BASE_URL)
+        return {name: base_url + name for name in COUNTRY_JSON_FILES}
 
-            count += 1
-            if count % INSERT_BATCH == 0:
-                do_bulk_insert("countries", data, dbPropertyMapping)
-                data = []
+    def _index_source(self, items, value_key) -> Dict[str, object]:
+        """ Returns the values of a country-json source by normalized country name.
+        """
+        index = {}
+        for item in items:
+            name = normalize_country_name(item.get("country"))
+            if name is not None and name not in index:
+                index[name] = item.get(value_key)
+        return index
+
+    def _import_country_data(self, fetcher):
+        """ Merges all attribute sources into the countries of
+        country-by-abbreviation.json. Each source is indexed once by
+        normalized country name, so each country is a dictionary lookup per
+        source. countries is replaced with an atomic swap.
+
+        Returns the number of imported countries.
+        """
+        countries = fetcher.load_json(COUNTRY_JSON_BASE_FILE)
+        indexes = [
+            self._index_source(fetcher.load_json(file_name), value_key)
+            for file_name, value_key, column in COUNTRY_ATTRIBUTES
+        ]
+        header = ["code", "name"] + [column for file_name, value_key, column in COUNTRY_ATTRIBUTES]
 
-        do_bulk_insert("countries", data, dbPropertyMapping)
+        def rows():
+            for country in countries:
+                name = normalize_country_name(country.get("country"))
+                yield (country.get("abbreviation"), country.get("country")) + tuple(
+                    index.get(name) for index in indexes
+                )
 
-        return True
+        return self.loader.replace_table("countries", header, rows())
 
     def start(self):
+        started_at = time.time()
         start_time = time.monotonic()
         current_app.logger.info("Running import of country data.")
 
-        self._import_country_data()
+        imported = []
+        with SourceFetcher.from_config() as fetcher:
+            self.progress("fetch")
+            fetcher.fetch_all(self._sources())
+
+            if self.force or fetcher.changed_sources():
+                self.loader = BulkLoader.from_config()
+                row_count = self._import_country_data(fetcher)
+                current_app.logger.info("Imported %s entries for countries", row_count)
+                self.progress("countries", row_count)
+                imported.append("countries")
+                snapshots.build_snapshots()
+                self.progress("snapshots")
+                record_import_run("countries", imported, started_at)
+            else:
+                current_app.logger.info("No source has changed since the last import.")
+
+            fetcher.mark_imported()
 
         current_app.logger.info("Import finished in %s seconds",
                                 time.monotonic() - start_time)
+
+        return imported
@@ -0,0 +1,238 @@
+import os
+import time
+import uuid
+import weakref
+import atexit
+import queue
+import logging
+import threading
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
+from apscheduler.schedulers.background import BackgroundScheduler
+from . import cache
+from .importer import CovidImporter, CountryImporter
+
+JOB_HISTORY = 100
+# "process" runs each import in its own process, "thread" in the runner thread
+IMPORT_WORKER = "process"
+IMPORTERS = {
+    "covid": CovidImporter,
+    "countries": CountryImporter,
+}
+
+logger = logging.getLogger('waitress')
+logger.setLevel(logging.INFO)
+
+class Job:
+    """ One import submitted to the JobRunner, its progress is reported by the
+    importer.
+    """
+
+    def __init__(self, kind, options):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.options = options
+        self.state = "queued"
+        self.phase = None
+        self.row_count = 0
+        self.imported = None
+        self.error = None
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+    def report(self, phase, row_count=0):
+        self.phase = phase
+        self.row_count += row_count
+
+    def to_dict(self) -> dict:
+        elapsed = 0
+        if self.started_at is not None:
+            elapsed = (self.finished_at or time.time()) - self.started_at
+
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "options": self.options,
+            "state": self.state,
+            "phase": self.phase,
+            "rows": self.row_count,
+            "imported": self.imported,
+            "error": self.error,
+            "submitted_at": self.submitted_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "elapsed": elapsed,
+        }
+
+class JobRunner:
+    """ Runs the imports from a background thread, so the import endpoints
+    return at once with a job id.
+
+    Imports are single-flight: while an import of a kind is queued or
+    running, submitting the same kind returns the pending job instead of
+    starting another one. Imports of different kinds run one after another,
+    since they share the database writer.
+
+    There is one runner per database and process, shared by all apps of the
+    process (e.g. the module level app and the app of `waitress-serve
+    --call src:create_app`), so single-flight holds across them.
+    """
+
+    def __init__(self, app, history=JOB_HISTORY):
+        self.app = app
+        # apps sharing this runner, their caches are invalidated after an import
+        self._apps = weakref.WeakSet([app])
+        self.history = history
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="import")
+        self._jobs = OrderedDict()
+        self._pending = {}
+        self._scheduler = None
+        self._lock = threading.Lock()
+
+    def add_app(self, app):
+        with self._lock:
+            self._apps.add(app)
+
+    def submit(self, kind, **options) -> Job:
+        with self._lock:
+            job = self._pending.get(kind)
+            if job is not None:
+                return job
+
+            job = Job(kind, options)
+            self._pending[kind] = job
+            self._jobs[job.id] = job
+            while len(self._jobs) > self.history:
+                self._jobs.popitem(last=False)
+
+        self._executor.submit(self._run, job)
+        return job
+
+    def get(self, job_id) -> Job:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _run(self, job):
+        job.state = "running"
+        job.started_at = time.time()
+        try:
+            with self.app.app_context():
+                job.imported = self.run_import(job)
+                if job.imported:
+                    import_run = cache.get_last_import_run()
+                    with self._lock:
+                        apps = list(self._apps)
+                    for app in apps:
+                        app.extensions["response_cache"].invalidate(import_run)
+            job.state = "finished"
+        except Exception as error:
+            logger.exception("Import job %s (%s) failed", job.id, job.kind)
+            job.error = str(error)
+            job.state = "failed"
+        finally:
+            job.finished_at = time.time()
+            with self._lock:
+                self._pending.pop(job.kind, None)
+
+    def run_import(self, job):
+        """ Runs the importer of job and returns the imported datasets.
+
+        By default the importer runs in a separate process, so parsing does
+        not hold the GIL of the api threads. It writes to the database
+        itself and sends its progress through a queue.
+        """
+        if self.app.config.get("IMPORT_WORKER", IMPORT_WORKER) == "thread":
+            importer = IMPORTERS[job.kind](progress=job.report, **job.options)
+            return importer.start()
+
+        context = multiprocessing.get_context("spawn")
+        messages = context.Queue()
+        process = context.Process(
+            target=run_import_process,
+            args=(dict(self.app.config), job.kind, job.options, messages),
+            name=f"import-{job.kind}",
+            daemon=True
+        )
+        process.start()
+        try:
+            while True:
+                try:
+                    message, *values = messages.get(timeout=1)
+                except queue.Empty:
+                    if process.exitcode is not None and messages.empty():
+                        raise RuntimeError(f"Import process exited with code {process.exitcode}")
+                    continue
+
+                if message == "progress":
+                    job.report(*values)
+                elif message == "done":
+                    return values[0]
+                else:
+                    raise RuntimeError(values[0])
+        finally:
+            process.join()
+
+    def schedule(self, interval):
+        """ Submits a covid import every interval seconds. The scheduler is
+        started only once, however many apps share this runner.
+        """
+        with self._lock:
+            if self._scheduler is not None:
+                return
+            self._scheduler = BackgroundScheduler()
+            self._scheduler.add_job(func=self.submit, args=["covid"], trigger="interval", seconds=interval)
+            self._scheduler.start()
+        # Shut down the scheduler when exiting the app
+        atexit.register(self._stop_scheduler)
+
+    def _stop_scheduler(self):
+        with self._lock:
+            if self._scheduler is not None:
+                self._scheduler.shutdown(wait=False)
+                self._scheduler = None
+
+    def shutdown(self):
+        with _runners_lock:
+            for database, runner in list(_runners.items()):
+                if runner is self:
+                    del _runners[database]
+        self._stop_scheduler()
+        self._executor.shutdown(wait=False)
+
+def run_import_process(config, kind, options, messages):
+    """ Entry point of the import process, it creates its own app with the
+    config of the web process.
+    """
+    from . import create_app
+
+    def report(phase, row_count=0):
+        messages.put(("progress", phase, row_count))
+
+    try:
+        app = create_app(config)
+        with app.app_context():
+            imported = IMPORTERS[kind](progress=report, **options).start()
+    except Exception as error:
+        logger.exception("Import process of %s failed", kind)
+        messages.put(("error", str(error)))
+    else:
+        messages.put(("done", imported))
+
+# JobRunner of each database of this process
+_runners = {}
+_runners_lock = threading.Lock()
+
+def init_app(app):
+    database = os.path.abspath(app.config["DATABASE"])
+    with _runners_lock:
+        runner = _runners.get(database)
+        if runner is None:
+            runner = _runners[database] = JobRunner(app, app.config.get("IMPORT_JOB_HISTORY", JOB_HISTORY))
+        runner.add_app(app)
+    app.extensions["jobs"] = runner
+
+def get_runner() -> JobRunner:
+    return current_app.extensions["jobs"]
@@ -0,0 +1,87 @@
+import time
+import itertools
+import logging
+from . import db
+from flask import current_app
+from typing import Iterable, List
+
+INSERT_BATCH = 1000
+BULK_CACHE_SIZE = 64 * 1024
+
+logger = logging.getLogger('waitress')
+logger.setLevel(logging.INFO)
+
+def clean_row(row) -> tuple:
+    """ Replaces empty strings with None.
+    """
+    return tuple(x if x != "" else None for x in row)
+
+def configure_bulk_pragmas(connection, cache_size=BULK_CACHE_SIZE):
+    """ Switches the database to WAL mode, so readers are not blocked while an
+    import runs, and tunes the connection for large writes. cache_size is
+    given in KiB.
+    """
+    connection.execute("PRAGMA journal_mode = WAL")
+    connection.execute("PRAGMA synchronous = NORMAL")
+    connection.execute(f"PRAGMA cache_size = -{int(cache_size)}")
+    connection.execute("PRAGMA temp_store = MEMORY")
+
+class BulkLoader:
+    """ Loads rows into tables with one prepared INSERT statement per table.
+    Each table is loaded in one transaction, rows are passed to sqlite in
+    batches of batch_size, so only one batch is held in memory.
+    """
+
+    def __init__(self, connection, batch_size=INSERT_BATCH):
+        self.connection = connection
+        self.batch_size = batch_size
+
+    @classmethod
+    def from_config(cls):
+        config = current_app.config
+        connection = db.get_writer_db()
+        configure_bulk_pragmas(connection, config.get("IMPORT_CACHE_SIZE", BULK_CACHE_SIZE))
+        return cls(connection, config.get("IMPORT_BATCH_SIZE", INSERT_BATCH))
+
+    def insert(self, table_name, header: List[str], rows: Iterable) -> int:
+        """ Inserts all rows within the running transaction.
+
+        Returns the number of inserted rows.
+        """
+        placeholder = ",".join("?" for column in header)
+        query = f'INSERT INTO {table_name} ({",".join(header).lower()}) VALUES ({placeholder})'
+        row_count = 0
+        rows = iter(rows)
+        start_time = time.monotonic()
+
+        while True:
+            batch = [clean_row(row) for row in itertools.islice(rows, self.batch_size)]
+            if not batch:
+                break
+
+            self.connection.executemany(query, batch)
+            row_count += len(batch)
+
+        duration = time.monotonic() - start_time
+        logger.info("Loaded %s rows into %s in %.2f seconds (%.0f rows/s)", row_count,
+                    table_name, duration, row_count / duration if duration else row_count)
+
+        return row_count
+
+    def load(self, table_name, header: List[str], rows: Iterable) -> int:
+        """ Inserts all rows into table_name in one transaction.
+        """
+        with db.transaction(self.connection):
+            return self.insert(table_name, header, rows)
+
+    def replace_table(self, table_name, header: List[str], rows: Iterable) -> int:
+        """ Loads all rows into a new table and swaps it in for table_name, all
+        in one transaction. Readers see the old table until the commit.
+        """
+        temp_table_name = table_name + "_new"
+        with db.transaction(self.connection):
+            db.create_table_like(self.connection, table_name, temp_table_name)
+            row_count = self.insert(temp_table_name, header, rows)
+            db.swap_table(self.connection, temp_table_name, table_name)
+
+        return row_count
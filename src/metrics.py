@@ -0,0 +1,156 @@
+import re
+import time
+import bisect
+import functools
+import threading
+from . import db
+from . import cache
+from flask import current_app, g, request
+
+REQUEST_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+# maximum length of the query label of a query
+QUERY_LABEL_LENGTH = 200
+# maximum number of series of a histogram, further label values are counted
+# in the series of OTHER_LABEL
+MAX_SERIES = 500
+OTHER_LABEL = "other"
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+def escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def format_labels(names, values) -> str:
+    return ",".join(f'{name}="{escape(value)}"' for name, value in zip(names, values))
+
+@functools.lru_cache(maxsize=1024)
+def query_label(sql) -> str:
+    """ Returns the query label of sql, with normalized whitespace, literals
+    replaced by ? and IN lists collapsed, so a query with different values
+    or a different number of parameters is one series.
+    """
+    sql = " ".join(sql.split())
+    sql = re.sub(r"'(?:[^']|'')*'", "?", sql)
+    sql = re.sub(r"\b\d+(?:\.\d+)?\b", "?", sql)
+    sql = re.sub(r"IN \((\?,\s*)+\?\)", "IN (?)", sql)
+    return sql[:QUERY_LABEL_LENGTH]
+
+class Histogram:
+    """ Prometheus histogram with a series per combination of label values.
+    Beyond max_series combinations the values are counted in one series with
+    all labels OTHER_LABEL.
+    """
+
+    def __init__(self, name, documentation, label_names, buckets, max_series=MAX_SERIES):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+        self.buckets = buckets
+        self.max_series = max_series
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, label_values: tuple, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None and len(self._series) >= self.max_series:
+                label_values = (OTHER_LABEL,) * len(self.label_names)
+                series = self._series.get(label_values)
+            if series is None:
+                # counts per bucket, sum
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = [(label_values, list(counts), total) for label_values, (counts, total) in self._series.items()]
+
+        for label_values, counts, total in sorted(series):
+            labels = format_labels(self.label_names, label_values)
+            count = 0
+            for bound, bucket_count in zip(self.buckets + ("+Inf",), counts):
+                count += bucket_count
+                lines.append(f'{self.name}_bucket{{{labels},le="{bound}"}} {count}')
+            lines.append(f"{self.name}_sum{{{labels}}} {total}")
+            lines.append(f"{self.name}_count{{{labels}}} {count}")
+        return lines
+
+def render_values(name, metric_type, documentation, values: dict) -> list:
+    """ Returns the lines of a counter or gauge without labels of each of
+    values (name suffix: value).
+    """
+    lines = []
+    for suffix, value in values.items():
+        full_name = f"{name}_{suffix}"
+        lines += [f"# HELP {full_name} {documentation} {suffix}", f"# TYPE {full_name} {metric_type}",
+                  f"{full_name} {value}"]
+    return lines
+
+class Metrics:
+    """ Latency and size of the responses by route and the time of each sql
+    query by query. The counters of the connection pool and the response
+    cache are read from their stats when rendered.
+    """
+
+    def __init__(self, max_series=MAX_SERIES):
+        self.request_seconds = Histogram(
+            "corona_http_request_duration_seconds", "Time until the response of a request.",
+            ("route", "method", "status"), REQUEST_BUCKETS, max_series)
+        self.response_bytes = Histogram(
+            "corona_http_response_size_bytes", "Size of the response body, streamed responses are not counted.",
+            ("route",), SIZE_BUCKETS, max_series)
+        self.query_seconds = Histogram(
+            "corona_sqlite_query_duration_seconds", "Time of execute and fetch calls of a query.",
+            ("query",), QUERY_BUCKETS, max_series)
+
+    def observe_query(self, sql, seconds):
+        self.query_seconds.observe((query_label(sql),), seconds)
+
+    def observe_response(self, route, method, response, seconds):
+        self.request_seconds.observe((route, method, str(response.status_code)), seconds)
+        if not response.is_streamed and response.content_length is not None:
+            self.response_bytes.observe((route,), response.content_length)
+
+    def render(self, pool_stats, cache_stats) -> str:
+        lines = self.request_seconds.render() + self.response_bytes.render() + self.query_seconds.render()
+        lines += render_values("corona_db_pool", "gauge", "Read connection pool",
+                               {"size": pool_stats["size"], "max_size": pool_stats["max_size"]})
+        lines += render_values("corona_db_pool", "counter", "Read connection pool",
+                               {name + "_total": pool_stats[name] for name in ("opened", "reused", "overflow")})
+        lines += render_values("corona_response_cache", "gauge", "Response cache",
+                               {name: cache_stats[name] for name in ("generation", "entries", "bytes", "max_bytes")})
+        lines += render_values("corona_response_cache", "counter", "Response cache",
+                               {name + "_total": cache_stats[name] for name in ("hits", "misses", "evictions")})
+        return "\n".join(lines) + "\n"
+
+def init_app(app):
+    """ Registers the metrics of app, unless METRICS is False. Has to be called
+    after db.init_app, the queries are timed by the connections of the pool.
+    """
+    if not app.config.get("METRICS", True):
+        return
+
+    metrics = app.extensions["metrics"] = Metrics(app.config.get("METRICS_MAX_SERIES", MAX_SERIES))
+    app.extensions["db_pool"].on_query = metrics.observe_query
+
+    @app.before_request
+    def start_timer():
+        g.request_start_time = time.perf_counter()
+
+    @app.after_request
+    def observe_response(response):
+        start_time = g.pop("request_start_time", None)
+        if start_time is not None:
+            route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+            metrics.observe_response(route, request.method, response, time.perf_counter() - start_time)
+        return response
+
+def get_metrics() -> Metrics:
+    return current_app.extensions.get("metrics")
+
+def render() -> str:
+    return get_metrics().render(db.get_pool().stats(), cache.get_cache().stats())
@@ -1,5 +1,3 @@
-DROP TABLE IF EXISTS cases_time;
-
 CREATE TABLE IF NOT EXISTS cases_time (
     country_region TEXT,
     country_code TEXT,
@@ -20,7 +18,6 @@ CREATE TABLE IF NOT EXISTS cases_time (
     Report_Date_String DATETIME
 );
 
-DROP TABLE IF EXISTS cases_total;
 CREATE TABLE IF NOT EXISTS cases_total (
     country_region TEXT,
     country_code TEXT,
@@ -42,8 +39,6 @@ CREATE TABLE IF NOT EXISTS cases_total (
     Report_Date_String DATETIME
 );
 
-DROP TABLE IF EXISTS cases_country;
-
 CREATE TABLE IF NOT EXISTS cases_country (
     country_region TEXT,
     country_code TEXT,
@@ -62,7 +57,6 @@ CREATE TABLE IF NOT EXISTS cases_country (
     iso3 TEXT
 );
 
-DROP TABLE IF EXISTS countries;
 CREATE TABLE IF NOT EXISTS countries (
     id INTEGER,
     code TEXT,
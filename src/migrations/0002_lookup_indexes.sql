@@ -0,0 +1,16 @@
+-- /countries and the country object of /covid19/cases-by-country
+CREATE INDEX IF NOT EXISTS countries_name_idx ON countries (LOWER(name));
+CREATE INDEX IF NOT EXISTS countries_code_lower_idx ON countries (LOWER(code));
+CREATE INDEX IF NOT EXISTS countries_code_idx ON countries (code);
+
+-- /covid19/cases-by-country and /covid19/cases-daily
+CREATE INDEX IF NOT EXISTS cases_time_country_region_idx ON cases_time (LOWER(country_region), last_update);
+CREATE INDEX IF NOT EXISTS cases_time_country_code_lower_idx ON cases_time (LOWER(country_code), last_update);
+CREATE INDEX IF NOT EXISTS cases_time_country_code_idx ON cases_time (country_code, last_update);
+CREATE INDEX IF NOT EXISTS cases_time_last_update_idx ON cases_time (last_update);
+
+-- /covid19/cases-total
+CREATE INDEX IF NOT EXISTS cases_total_country_region_idx ON cases_total (LOWER(country_region));
+CREATE INDEX IF NOT EXISTS cases_total_country_code_lower_idx ON cases_total (LOWER(country_code));
+CREATE INDEX IF NOT EXISTS cases_total_country_code_idx ON cases_total (country_code, last_update);
+CREATE INDEX IF NOT EXISTS cases_country_country_code_idx ON cases_country (country_code, last_update);
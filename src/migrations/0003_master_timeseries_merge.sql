@@ -0,0 +1,6 @@
+-- delta of the deaths master timeseries
+ALTER TABLE cases_time ADD COLUMN delta_deaths INTEGER;
+
+-- join keys of the master timeseries merge
+CREATE INDEX IF NOT EXISTS cases_time_country_region_last_update_idx ON cases_time (country_region, last_update);
+CREATE INDEX IF NOT EXISTS cases_total_country_region_exact_idx ON cases_total (country_region);
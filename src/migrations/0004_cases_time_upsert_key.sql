@@ -0,0 +1,14 @@
+-- key of the incremental cases_time import
+
+-- rows without iso code (e.g. Diamond Princess, MS Zaandam) have an empty
+-- code, they must not be deduplicated and must not conflict in the key
+UPDATE cases_time SET country_code = NULL WHERE country_code = '';
+
+DELETE FROM cases_time
+WHERE country_code IS NOT NULL
+  AND rowid NOT IN (
+    SELECT MAX(rowid) FROM cases_time GROUP BY country_code, last_update
+  );
+
+DROP INDEX IF EXISTS cases_time_country_code_idx;
+CREATE UNIQUE INDEX IF NOT EXISTS cases_time_country_code_last_update_key ON cases_time (country_code, last_update);
@@ -0,0 +1,55 @@
+-- rollups of cases_time and cases_total, rebuilt by every covid import
+
+CREATE TABLE IF NOT EXISTS cases_daily_worldwide (
+    last_update DATETIME PRIMARY KEY,
+    confirmed INTEGER,
+    deaths INTEGER,
+    recovered INTEGER,
+    delta_confirmed INTEGER,
+    delta_recovered INTEGER,
+    delta_deaths INTEGER
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS cases_daily_country (
+    country_region TEXT,
+    country_code TEXT,
+    last_update DATETIME,
+    confirmed INTEGER,
+    deaths INTEGER,
+    recovered INTEGER,
+    delta_confirmed INTEGER,
+    delta_recovered INTEGER,
+    delta_deaths INTEGER,
+    PRIMARY KEY (country_region, last_update)
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS cases_daily_country_country_region_idx ON cases_daily_country (LOWER(country_region), last_update);
+CREATE INDEX IF NOT EXISTS cases_daily_country_country_code_idx ON cases_daily_country (LOWER(country_code), last_update);
+
+CREATE TABLE IF NOT EXISTS cases_total_worldwide (
+    last_update DATETIME,
+    confirmed INTEGER,
+    deaths INTEGER,
+    recovered INTEGER,
+    delta_confirmed INTEGER,
+    delta_recovered INTEGER,
+    delta_deaths INTEGER
+);
+
+INSERT INTO cases_daily_worldwide
+SELECT last_update, SUM(confirmed), SUM(deaths), SUM(recovered),
+    SUM(delta_confirmed), SUM(delta_recovered), SUM(delta_deaths)
+FROM cases_time
+GROUP BY last_update;
+
+INSERT INTO cases_daily_country
+SELECT country_region, MAX(country_code), last_update, SUM(confirmed), SUM(deaths), SUM(recovered),
+    SUM(delta_confirmed), SUM(delta_recovered), SUM(delta_deaths)
+FROM cases_time
+GROUP BY country_region, last_update;
+
+INSERT INTO cases_total_worldwide
+SELECT MAX(ct.last_update), SUM(cc.confirmed), SUM(cc.deaths), SUM(cc.recovered),
+    SUM(ct.delta_confirmed), SUM(ct.delta_recovered), SUM(ct.delta_deaths)
+FROM cases_total ct
+JOIN cases_country cc ON ct.country_code = cc.country_code;
@@ -0,0 +1,9 @@
+-- pre-rendered responses of the unfiltered read endpoints, rebuilt by every import
+
+CREATE TABLE IF NOT EXISTS snapshots (
+    name TEXT PRIMARY KEY,
+    identity BLOB NOT NULL,
+    gzip BLOB NOT NULL,
+    br BLOB,
+    created_at REAL NOT NULL
+) WITHOUT ROWID;
@@ -0,0 +1,9 @@
+-- one row per import which changed data, the last row versions the api responses
+
+CREATE TABLE IF NOT EXISTS import_runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    importer TEXT NOT NULL,
+    datasets TEXT NOT NULL,
+    started_at REAL NOT NULL,
+    finished_at REAL NOT NULL
+);
@@ -0,0 +1,92 @@
+-- STRICT case tables with only the served columns. Dates are stored as
+-- integer day numbers (days since 1970-01-01) and converted to ISO dates by
+-- the endpoints. The daily rollups are served from the in-memory time series.
+
+DROP TABLE IF EXISTS cases_daily_worldwide;
+DROP TABLE IF EXISTS cases_daily_country;
+
+CREATE TABLE cases_time_new (
+    country_region TEXT NOT NULL,
+    country_code TEXT,
+    last_update INTEGER NOT NULL,
+    confirmed INTEGER,
+    deaths INTEGER,
+    recovered INTEGER,
+    delta_confirmed INTEGER,
+    delta_recovered INTEGER,
+    delta_deaths INTEGER
+) STRICT;
+
+INSERT INTO cases_time_new
+SELECT country_region, country_code, CAST(julianday(last_update) - 2440587.5 AS INTEGER),
+    CAST(confirmed AS INTEGER), CAST(deaths AS INTEGER), CAST(recovered AS INTEGER),
+    CAST(delta_confirmed AS INTEGER), CAST(delta_recovered AS INTEGER), CAST(delta_deaths AS INTEGER)
+FROM cases_time
+WHERE country_region IS NOT NULL AND julianday(last_update) IS NOT NULL;
+
+DROP TABLE cases_time;
+ALTER TABLE cases_time_new RENAME TO cases_time;
+
+CREATE UNIQUE INDEX cases_time_country_code_last_update_key ON cases_time (country_code, last_update);
+CREATE INDEX cases_time_country_region_last_update_idx ON cases_time (country_region, last_update);
+
+CREATE TABLE cases_total_new (
+    country_region TEXT NOT NULL,
+    country_code TEXT,
+    last_update INTEGER NOT NULL,
+    delta_confirmed INTEGER,
+    delta_recovered INTEGER,
+    delta_deaths INTEGER
+) STRICT;
+
+INSERT INTO cases_total_new
+SELECT country_region, country_code, CAST(julianday(last_update) - 2440587.5 AS INTEGER),
+    CAST(delta_confirmed AS INTEGER), CAST(delta_recovered AS INTEGER), CAST(delta_deaths AS INTEGER)
+FROM cases_total
+WHERE country_region IS NOT NULL AND julianday(last_update) IS NOT NULL;
+
+DROP TABLE cases_total;
+ALTER TABLE cases_total_new RENAME TO cases_total;
+
+CREATE INDEX cases_total_country_region_idx ON cases_total (LOWER(country_region));
+CREATE INDEX cases_total_country_code_lower_idx ON cases_total (LOWER(country_code));
+CREATE INDEX cases_total_country_region_exact_idx ON cases_total (country_region);
+CREATE INDEX cases_total_country_code_idx ON cases_total (country_code);
+
+CREATE TABLE cases_country_new (
+    country_region TEXT NOT NULL,
+    country_code TEXT,
+    confirmed INTEGER,
+    deaths INTEGER,
+    recovered INTEGER,
+    active INTEGER
+) STRICT;
+
+INSERT INTO cases_country_new
+SELECT country_region, country_code,
+    CAST(confirmed AS INTEGER), CAST(deaths AS INTEGER), CAST(recovered AS INTEGER), CAST(active AS INTEGER)
+FROM cases_country
+WHERE country_region IS NOT NULL;
+
+DROP TABLE cases_country;
+ALTER TABLE cases_country_new RENAME TO cases_country;
+
+CREATE INDEX cases_country_country_code_idx ON cases_country (country_code);
+
+DROP TABLE cases_total_worldwide;
+
+CREATE TABLE cases_total_worldwide (
+    last_update INTEGER,
+    confirmed INTEGER,
+    deaths INTEGER,
+    recovered INTEGER,
+    delta_confirmed INTEGER,
+    delta_recovered INTEGER,
+    delta_deaths INTEGER
+) STRICT;
+
+INSERT INTO cases_total_worldwide
+SELECT MAX(ct.last_update), SUM(cc.confirmed), SUM(cc.deaths), SUM(cc.recovered),
+    SUM(ct.delta_confirmed), SUM(ct.delta_recovered), SUM(ct.delta_deaths)
+FROM cases_total ct
+JOIN cases_country cc ON ct.country_code = cc.country_code;
@@ -0,0 +1,5 @@
+-- Empty country codes are stored as NULL, like the bulk loader does. Fixes
+-- databases which were migrated before 0004 normalized them.
+UPDATE cases_time SET country_code = NULL WHERE country_code = '';
+UPDATE cases_total SET country_code = NULL WHERE country_code = '';
+UPDATE cases_country SET country_code = NULL WHERE country_code = '';
@@ -0,0 +1,6 @@
+-- The STRICT rebuild of cases_time in 0008 dropped the lookup indexes of
+-- 0002, the case insensitive country filters and date ranges of the
+-- exports need them.
+CREATE INDEX IF NOT EXISTS cases_time_country_region_idx ON cases_time (LOWER(country_region), last_update);
+CREATE INDEX IF NOT EXISTS cases_time_country_code_lower_idx ON cases_time (LOWER(country_code), last_update);
+CREATE INDEX IF NOT EXISTS cases_time_last_update_idx ON cases_time (last_update);
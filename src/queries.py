@@ -0,0 +1,326 @@
+import re
+from . import db
+from . import timeseries
+from .formats import Projection
+from .utils import day_to_iso, iso_to_day
+
+# maximum number of countries of one request
+BATCH_MAX_COUNTRIES = 50
+
+def split_list(values) -> list:
+    """ Returns the values of a query parameter which is repeated or given
+    as comma separated list. A comma followed by a space is part of a name,
+    e.g. `Korea, South`.
+    """
+    result = []
+    for value in values:
+        result += [name.strip() for name in re.split(r",(?! )", value) if name.strip()]
+    return result
+
+def in_filter(column, values):
+    """ Returns the case insensitive condition column IN values and its
+    parameters.
+    """
+    placeholders = ",".join("?" for value in values)
+    return f"LOWER({column}) IN ({placeholders})", [value.lower() for value in values]
+
+class Page:
+    """ Date range and keyset pagination of a timeline. since, until and
+    cursor are day numbers, cursor is the date of the last entry of the
+    previous page. After a truncated page next_cursor is the cursor of the
+    next page.
+    """
+
+    def __init__(self, since=None, until=None, limit=None, cursor=None):
+        self.since = since
+        self.until = until
+        self.limit = limit
+        self.cursor = cursor
+        self.next_cursor = None
+
+    @classmethod
+    def from_args(cls, args):
+        """ Returns the page of the query parameters since, until, limit and
+        cursor. Raises ValueError on invalid values.
+        """
+        values = {}
+        for name in ("since", "until", "cursor"):
+            value = args.get(name)
+            if value:
+                try:
+                    values[name] = iso_to_day(value)
+                except ValueError:
+                    raise ValueError(f"{name} must be a date (YYYY-MM-DD)")
+
+        limit = args.get("limit")
+        if limit:
+            if not limit.isdigit() or int(limit) < 1:
+                raise ValueError("limit must be a positive number")
+            values["limit"] = int(limit)
+
+        return cls(**values)
+
+    def timeline(self, series, countries, metrics, descending=False) -> dict:
+        """ Returns the timeline columns of this page, see TimeSeries.columns.
+        """
+        since, until = self.since, self.until
+        if self.cursor is not None:
+            if descending:
+                until = self.cursor - 1 if until is None else min(until, self.cursor - 1)
+            else:
+                since = self.cursor + 1 if since is None else max(since, self.cursor + 1)
+
+        # one more day tells if there is a next page
+        limit = None if self.limit is None else self.limit + 1
+        columns = series.columns(countries, metrics, since, until, limit, descending)
+        if self.limit is not None and len(columns["date"]) > self.limit:
+            columns = {name: values[:self.limit] for name, values in columns.items()}
+            # with several timelines the next page starts after the shortest one
+            cursors = [cursor for cursor in (self.next_cursor, columns["date"][-1]) if cursor]
+            self.next_cursor = max(cursors) if descending else min(cursors)
+
+        return columns
+
+    def timelines(self, series, country_lists, metrics, descending=False) -> list:
+        """ Returns the timeline columns of this page of each of country_lists.
+        After a truncated page every timeline ends at next_cursor, so the next
+        page neither repeats nor skips days of the longer timelines.
+        """
+        timelines = [self.timeline(series, countries, metrics, descending) for countries in country_lists]
+        if self.next_cursor is None:
+            return timelines
+
+        clipped = []
+        for columns in timelines:
+            if descending:
+                count = sum(1 for date in columns["date"] if date >= self.next_cursor)
+            else:
+                count = sum(1 for date in columns["date"] if date <= self.next_cursor)
+            clipped.append({name: values[:count] for name, values in columns.items()})
+        return clipped
+
+def get_countries(countries=None, codes=None, projection=None):
+    """ Returns all countries or the countries with the names countries or
+    the codes codes. A single requested country is returned as object.
+    """
+    projection = projection or Projection()
+    where, params = "", []
+    if countries:
+        where, params = in_filter("name", countries)
+        where = "WHERE " + where
+    elif codes:
+        where, params = in_filter("code", codes)
+        where = "WHERE " + where
+
+    query = f"""
+    SELECT code, name, population, life_expectancy, continent, capital, population_density, avg_temperature
+    FROM countries
+    {where}
+    ORDER BY name ASC
+    """
+
+    cursor = db.get_db().cursor()
+    cursor.execute(query, params)
+
+    result = []
+    country = {}
+    for row in cursor.fetchall():
+        code, name, population, life_expectancy, continent, capital, population_density, avg_temperature = row
+        country = {
+            "code": code,
+            "name": name,
+            "population": population,
+            "life_expectancy": life_expectancy,
+            "continent": continent,
+            "capital": capital,
+            "population_density": population_density,
+            "avg_temperature": avg_temperature
+        }
+        result.append(country)
+
+    if len(params) == 1:
+        return projection.record(country) if country else []
+
+    return projection.records(result)
+
+def get_cases_by_country(countries=None, codes=None, page=None, projection=None):
+    """ Returns the timeline of each of the countries (or codes) with its
+    country, all countries are looked up with one query. A single requested
+    country is returned as object, empty if it has no timeline. The
+    projection applies to the timeline, the date is always included.
+    """
+    page = page or Page()
+    projection = projection or Projection()
+    metrics = projection.select(["confirmed", "deaths", "recovered"])
+    series = timeseries.get_series()
+    if countries:
+        names, column = countries, "name"
+        indexes = [series.find(countries=[name]) for name in names]
+    else:
+        names, column = codes, "code"
+        indexes = [series.find(codes=[code]) for code in names]
+
+    where, params = in_filter(column, names)
+    cursor = db.get_db().cursor()
+    cursor.execute(f"""
+    SELECT code, name, population, life_expectancy, continent, capital, population_density, avg_temperature
+    FROM countries
+    WHERE {where}
+    """, params)
+
+    country_rows = {}
+    for row in cursor.fetchall():
+        code, name, population, life_expectancy, continent, capital, population_density, avg_temperature = row
+        country_rows[(name if column == "name" else code).lower()] = {
+            "code": code,
+            "name": name,
+            "population": population,
+            "life_expectancy": life_expectancy,
+            "continent": continent,
+            "capital": capital,
+            "population_density": population_density,
+            "avg_temperature": avg_temperature
+        }
+
+    result = []
+    for name, timeline in zip(names, page.timelines(series, indexes, metrics)):
+        if timeline["date"]:
+            result.append({
+                "country": country_rows.get(name.lower()),
+                "timeline": projection.columns(timeline)
+            })
+
+    if len(names) == 1:
+        return result[0] if result else {}
+
+    return result
+
+def get_cases_worldwide(projection=None):
+    cursor = db.get_db().cursor()
+    query = f"""
+    SELECT
+        confirmed,
+        deaths,
+        recovered,
+        last_update,
+        delta_confirmed,
+        delta_recovered,
+        delta_deaths
+    FROM cases_total_worldwide
+    """
+    cursor.execute(query)
+
+    result = {}
+    row = cursor.fetchone()
+    if row is None:
+        return result
+
+    confirmed, deaths, recovered, last_update, delta_confirmed, delta_recovered, delta_deaths = row
+
+    result = {
+        "confirmed": confirmed,
+        "deaths": deaths,
+        "recovered": recovered,
+        "delta_confirmed": delta_confirmed,
+        "delta_recovered": delta_recovered,
+        "delta_deaths": delta_deaths,
+        "date": day_to_iso(last_update)
+    }
+
+    return (projection or Projection()).record(result)
+
+def get_cases_total(country_filter=None, country_code_filter=None, projection=None):
+    projection = projection or Projection()
+    cursor = db.get_db().cursor()
+
+    where, params = "", []
+    if country_filter:
+        where, params = in_filter("ct.country_region", country_filter)
+        where = "WHERE " + where
+    elif country_code_filter:
+        where, params = in_filter("ct.country_code", country_code_filter)
+        where = "WHERE " + where
+
+    query = f"""
+    SELECT
+        ct.country_region,
+        cc.confirmed,
+        cc.deaths,
+        cc.recovered,
+        cc.active,
+        ct.last_update,
+        ct.delta_confirmed,
+        ct.delta_recovered,
+        ct.delta_deaths,
+        c.code,
+        c.name,
+        c.population,
+        c.life_expectancy,
+        c.continent,
+        c.capital,
+        c.population_density,
+        c.avg_temperature
+    FROM cases_total ct
+    JOIN countries c ON ct.country_code = c.code
+    JOIN cases_country cc ON cc.country_code = ct.country_code
+    { where }
+    ORDER BY c.name
+    """
+    cursor.execute(query, params)
+
+    result = []
+    country = {}
+    cases = {}
+    for row in cursor.fetchall():
+        country_region, confirmed, deaths, recovered, active, last_update, delta_confirmed, delta_recovered, delta_deaths, code, name, population, life_expectancy, continent, capital, population_density, avg_temperature = row
+
+        country = {
+            "code": code,
+            "name": name,
+            "population": population,
+            "life_expectancy": life_expectancy,
+            "continent": continent,
+            "capital": capital,
+            "population_density": population_density,
+            "avg_temperature": avg_temperature
+        }
+
+        cases = {
+            "confirmed": confirmed,
+            "deaths": deaths,
+            "recovered": recovered,
+            "active": active,
+            "delta_confirmed": delta_confirmed,
+            "delta_recovered": delta_recovered,
+            "delta_deaths": delta_deaths,
+            "date": day_to_iso(last_update)
+        }
+
+        if not country_filter or not country_code_filter:
+            result.append({
+                "country": country,
+                "cases": cases,
+            })
+        else:
+            result = cases
+
+    if isinstance(result, dict):
+        return projection.record(result)
+
+    return projection.records(result)
+
+def get_cases_daily(country_filter=None, country_code_filter=None, page=None, projection=None):
+    """ Returns the daily cases of all countries or summed up over the
+    countries of country_filter or country_code_filter. The date is always
+    included.
+    """
+    projection = projection or Projection()
+    series = timeseries.get_series()
+    countries = series.find(country_filter, country_code_filter)
+
+    return projection.columns((page or Page()).timeline(
+        series,
+        countries,
+        projection.select(["confirmed", "deaths", "recovered", "delta_confirmed", "delta_recovered"]),
+        descending=True
+    ))
@@ -0,0 +1,116 @@
+import gzip
+import time
+import logging
+import functools
+from . import db
+from . import cache
+from . import queries
+from . import utils
+from flask import current_app, request, jsonify
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+GZIP_LEVEL = 9
+BROTLI_QUALITY = 11
+
+logger = logging.getLogger('waitress')
+logger.setLevel(logging.INFO)
+
+# payloads rendered by build_snapshots, by snapshot name
+SNAPSHOTS = {
+    "countries": queries.get_countries,
+    "cases-total": queries.get_cases_total,
+    "cases-total-worldwide": queries.get_cases_worldwide,
+    "cases-daily": queries.get_cases_daily,
+}
+
+# query parameters which change the response of an endpoint
+FILTER_ARGS = ("country", "code", "worldwide", "since", "until", "limit", "cursor")
+FORMAT_ARGS = ("fields", "format")
+
+def unfiltered(args) -> bool:
+    return not any(args.get(name) for name in FILTER_ARGS + FORMAT_ARGS)
+
+def worldwide(args) -> bool:
+    return utils.parse_bool(args.get("worldwide")) and not any(args.get(name) for name in FORMAT_ARGS)
+
+def build_snapshots():
+    """ Renders all SNAPSHOTS to json once and stores them with their gzip and
+    brotli encodings, so the endpoints serve them without serializing or
+    compressing per request. Called by the importers after each import which
+    changed data. brotli is optional, without it only gzip is stored.
+    """
+    start_time = time.monotonic()
+    rows = []
+    for name, get_payload in SNAPSHOTS.items():
+        body = jsonify(get_payload()).get_data()
+        rows.append((
+            name,
+            body,
+            gzip.compress(body, GZIP_LEVEL, mtime=0),
+            brotli.compress(body, quality=BROTLI_QUALITY) if brotli is not None else None,
+            time.time(),
+        ))
+
+    connection = db.get_writer_db()
+    with db.transaction(connection):
+        connection.execute("DELETE FROM snapshots")
+        connection.executemany(
+            "INSERT INTO snapshots (name, identity, gzip, br, created_at) VALUES (?, ?, ?, ?, ?)",
+            rows
+        )
+
+    logger.info("Built %s snapshots in %.2f seconds", len(rows), time.monotonic() - start_time)
+
+class SnapshotStore(cache.ReloadedStore):
+    """ Keeps the snapshots table in memory. It is reloaded on the first
+    request after the response cache was invalidated, i.e. after an import.
+    """
+
+    def load(self):
+        return {
+            row["name"]: {"identity": row["identity"], "gzip": row["gzip"], "br": row["br"]}
+            for row in db.get_db().execute("SELECT name, identity, gzip, br FROM snapshots")
+        }
+
+    def get(self, name):
+        return self.current().get(name)
+
+def init_app(app):
+    app.extensions["snapshots"] = SnapshotStore()
+
+def get_store() -> SnapshotStore:
+    return current_app.extensions["snapshots"]
+
+def select_encoding(snapshot) -> str:
+    """ Returns the best encoding of snapshot accepted by the client.
+    """
+    for encoding in ("br", "gzip"):
+        if snapshot[encoding] is not None and request.accept_encodings[encoding]:
+            return encoding
+    return "identity"
+
+def snapshot_response(name, when):
+    """ Serves the snapshot name instead of calling the view, if when(request.args)
+    is true and the snapshot has been built.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            snapshot = get_store().get(name) if when(request.args) else None
+            if snapshot is None:
+                return view(*args, **kwargs)
+
+            encoding = select_encoding(snapshot)
+            response = current_app.response_class(snapshot[encoding], mimetype="application/json")
+            if encoding != "identity":
+                response.headers["Content-Encoding"] = encoding
+            response.vary.add("Accept-Encoding")
+            return response
+
+        return wrapper
+
+    return decorator
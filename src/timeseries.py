@@ -0,0 +1,137 @@
+import time
+import logging
+import numpy as np
+from . import db
+from . import cache
+from flask import current_app
+from typing import List
+
+METRICS = ["confirmed", "deaths", "recovered", "delta_confirmed", "delta_recovered", "delta_deaths"]
+
+logger = logging.getLogger('waitress')
+logger.setLevel(logging.INFO)
+
+def to_list(values) -> list:
+    """ Returns values as python ints, NaN as None.
+    """
+    result = np.nan_to_num(values).astype(np.int64).tolist()
+    for i in np.flatnonzero(np.isnan(values)):
+        result[i] = None
+    return result
+
+class TimeSeries:
+    """ Dense in-memory copy of cases_time with one 2-D array (country, day)
+    per metric. Countries are the distinct country_region values, days the
+    distinct dates of cases_time in ascending order.
+
+    Missing values are NaN and `present` marks the (country, day) pairs which
+    have a row, so sums behave like SUM of sqlite.
+    """
+
+    def __init__(self, regions: List[str], codes: List[str], days, values, counts, present):
+        self.regions = regions
+        self.days = days
+        self.dates = np.datetime_as_string(days.astype("datetime64[D]")).tolist()
+        self.values = values
+        self.counts = counts
+        self.present = present
+        self.region_index = {}
+        self.code_index = {}
+        for i, (region, code) in enumerate(zip(regions, codes)):
+            self.region_index.setdefault(region.lower(), []).append(i)
+            if code is not None:
+                self.code_index.setdefault(code.lower(), []).append(i)
+
+    @classmethod
+    def load(cls, connection):
+        start_time = time.monotonic()
+        rows = connection.execute(f"""
+        SELECT country_region, country_code, last_update, {", ".join(METRICS)}
+        FROM cases_time
+        """).fetchall()
+        columns = list(zip(*rows)) or [()] * (3 + len(METRICS))
+
+        regions, region_ids = np.unique(np.array(columns[0], dtype=object), return_inverse=True)
+        days, day_ids = np.unique(np.array(columns[2], dtype=np.int64), return_inverse=True)
+        shape = (len(regions), len(days))
+
+        # country code of a region is the greatest code of its rows
+        codes = [None] * len(regions)
+        for region_id, code in zip(region_ids.tolist(), columns[1]):
+            if code is not None and (codes[region_id] is None or code > codes[region_id]):
+                codes[region_id] = code
+
+        present = np.zeros(shape, dtype=bool)
+        present[region_ids, day_ids] = True
+
+        values = {}
+        counts = {}
+        for metric, column in zip(METRICS, columns[3:]):
+            column = np.array(column, dtype=np.float64)
+            known = ~np.isnan(column)
+            values[metric] = np.zeros(shape)
+            counts[metric] = np.zeros(shape, dtype=np.int32)
+            np.add.at(values[metric], (region_ids[known], day_ids[known]), column[known])
+            np.add.at(counts[metric], (region_ids[known], day_ids[known]), 1)
+            values[metric][counts[metric] == 0] = np.nan
+
+        logger.info("Loaded time series of %s countries and %s days in %.3f seconds",
+                    shape[0], shape[1], time.monotonic() - start_time)
+        return cls(regions.tolist(), codes, days, values, counts, present)
+
+    def find(self, countries=None, codes=None) -> List[int]:
+        """ Returns the indexes of the countries with a country_region of
+        countries or a country code of codes, case insensitive. Without
+        countries and codes all indexes are returned.
+        """
+        if countries:
+            index, names = self.region_index, countries
+        elif codes:
+            index, names = self.code_index, codes
+        else:
+            return list(range(len(self.regions)))
+
+        return list(dict.fromkeys(i for name in names for i in index.get(name.lower(), [])))
+
+    def columns(self, countries: List[int], metrics=METRICS, since=None, until=None,
+                limit=None, descending=False) -> dict:
+        """ Returns the dates and the summed metrics of countries per day as
+        lists by name, only days with data of at least one of the countries.
+
+        since and until are inclusive day numbers, the range is found by a
+        binary search on the sorted days. limit is the maximum number of days
+        in the order of the timeline.
+        """
+        first = 0 if since is None else np.searchsorted(self.days, since, side="left")
+        last = len(self.days) if until is None else np.searchsorted(self.days, until, side="right")
+        days = first + np.flatnonzero(self.present[countries, first:last].any(axis=0))
+        if descending:
+            days = days[::-1]
+        if limit is not None:
+            days = days[:limit]
+
+        index = np.ix_(countries, days)
+        columns = {"date": [self.dates[day] for day in days]}
+        for metric in metrics:
+            known = self.counts[metric][index].any(axis=0)
+            columns[metric] = to_list(np.where(known, np.nansum(self.values[metric][index], axis=0), np.nan))
+
+        return columns
+
+class TimeSeriesStore(cache.ReloadedStore):
+    """ Holds the TimeSeries of the current data. It is loaded again on the
+    first request after the response cache was invalidated and replaced as
+    a whole, so readers never see a partly loaded series.
+    """
+
+    def load(self) -> TimeSeries:
+        return TimeSeries.load(db.get_db())
+
+    def get(self) -> TimeSeries:
+        return self.current()
+
+def init_app(app):
+    app.extensions["timeseries"] = TimeSeriesStore()
+
+def get_series() -> TimeSeries:
+    return current_app.extensions["timeseries"].get()
@@ -1,4 +1,9 @@
 import re
+import datetime
+import functools
+import unicodedata
+
+EPOCH = datetime.date(1970, 1, 1)
 
 
 def map_date(date):
@@ -12,4 +17,96 @@ def map_date(date):
         month, day, year = re_result.groups()
         # attention: this will only work for 80 years! ;)
         return f"20{year}-{int(month):02}-{int(day):02}"
-    return False
\ No newline at end of file
+    return False
+
+# the same few hundred dates repeat for every country of a source
+@functools.lru_cache(maxsize=4096)
+def map_day(date):
+    """Maps a date in the form of mm/dd/yy to the number of days since
+    1970-01-01, the date key of the cases tables.
+
+    Returns None, if date cannot be mapped.
+    """
+    iso_date = map_date(date)
+    if not iso_date:
+        return None
+    return (datetime.date.fromisoformat(iso_date) - EPOCH).days
+
+def iso_to_day(date):
+    """Maps an ISO date string to a day number of the cases tables.
+
+    Raises ValueError, if date is not an ISO date.
+    """
+    return (datetime.date.fromisoformat(date) - EPOCH).days
+
+def day_to_iso(day):
+    """Maps a day number of the cases tables to an ISO date string.
+    """
+    if day is None:
+        return None
+    return (EPOCH + datetime.timedelta(days=day)).isoformat()
+
+def parse_int(value):
+    """Parses a count of the csv sources, which are partly written as
+    floats (`0.0`). Returns None for empty values.
+    """
+    if value == "":
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        return int(float(value))
+
+def parse_bool(value):
+    """Parses a boolean query parameter, e.g. `force=1` or `full=true`.
+    Returns False for missing values and `0`, `false`, `no` and `off`.
+    """
+    return value is not None and value.strip().lower() in ("1", "true", "yes", "on")
+
+# Normalized country name variants used by some sources, mapped to the
+# normalized name of country-by-abbreviation.json.
+COUNTRY_NAME_ALIASES = {
+    "united states of america": "united states",
+    "usa": "united states",
+    "us": "united states",
+    "russia": "russian federation",
+    "czechia": "czech republic",
+    "cote divoire": "ivory coast",
+    "libya": "libyan arab jamahiriya",
+    "vatican city": "holy see vatican city state",
+    "holy see": "holy see vatican city state",
+    "fiji": "fiji islands",
+    "cabo verde": "cape verde",
+    "eswatini": "swaziland",
+    "macedonia": "north macedonia",
+    "korea south": "south korea",
+    "republic of korea": "south korea",
+    "korea north": "north korea",
+    "democratic republic of the congo": "democratic republic of congo",
+    "congo kinshasa": "democratic republic of congo",
+    "congo brazzaville": "congo",
+    "republic of the congo": "congo",
+    "micronesia": "micronesia federated states of",
+    "burma": "myanmar",
+    "timor leste": "east timor",
+    "viet nam": "vietnam",
+}
+
+def normalize_country_name(name):
+    """Maps a country name to a key which is equal for common spelling variants,
+    e.g. "Côte d'Ivoire" and "Ivory Coast".
+
+    Returns None, if name is empty.
+    """
+    if not name:
+        return None
+
+    name = unicodedata.normalize("NFKD", name)
+    name = "".join(c for c in name if not unicodedata.combining(c))
+    name = name.casefold().replace("&", " and ")
+    name = re.sub(r"[^\w\s]", "", name.replace("-", " "))
+    name = " ".join(name.split())
+    if name.startswith("the "):
+        name = name[4:]
+
+    return COUNTRY_NAME_ALIASES.get(name, name)
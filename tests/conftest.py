@@ -0,0 +1,45 @@
+import pytest
+from src import create_app, db
+from src.utils import iso_to_day
+
+@pytest.fixture
+def config(tmp_path):
+    return {
+        "TESTING": True,
+        "DATABASE": str(tmp_path / "corona.sqlite"),
+        "SOURCE_CACHE_DIR": str(tmp_path / "source_cache"),
+        "IMPORT_OFFLINE": True,
+        "IMPORT_WORKER": "thread",
+    }
+
+@pytest.fixture
+def app(config):
+    app = create_app(config)
+    with app.app_context():
+        db.init_db()
+    yield app
+    app.extensions["jobs"].shutdown()
+    app.extensions["db_pool"].close_all()
+
+@pytest.fixture
+def insert_cases(app):
+    """ Returns a function which inserts (country, code, ISO date, confirmed)
+    rows into cases_time, the other counts are derived from confirmed. New
+    countries of the rows are added to countries.
+    """
+    def insert(rows):
+        with app.app_context():
+            connection = db.get_writer_db()
+            with connection:
+                connection.executemany(
+                    "INSERT INTO cases_time (country_region, country_code, last_update, confirmed, deaths, "
+                    "recovered, delta_confirmed, delta_recovered, delta_deaths) VALUES (?, ?, ?, ?, ?, ?, 1, 1, 1)",
+                    [(country, code, iso_to_day(date), confirmed, confirmed // 10, confirmed // 2)
+                     for country, code, date, confirmed in rows])
+                connection.executemany(
+                    "INSERT INTO countries (code, name, continent) SELECT ?, ?, 'Europe' "
+                    "WHERE NOT EXISTS (SELECT 1 FROM countries WHERE name = ?)",
+                    [(code, country, country) for country, code in dict.fromkeys(
+                        (country, code) for country, code, _, _ in rows)])
+
+    return insert
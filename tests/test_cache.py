@@ -0,0 +1,67 @@
+from src import cache
+
+class CountingStore(cache.ReloadedStore):
+    def __init__(self):
+        super().__init__()
+        self.loads = 0
+
+    def load(self):
+        self.loads += 1
+        return self.loads
+
+def test_reloaded_store_loads_once_per_generation(app):
+    store = CountingStore()
+    with app.app_context():
+        assert store.current() == 1
+        assert store.current() == 1
+        cache.invalidate()
+        assert store.current() == 2
+        assert store.loads == 2
+
+def test_response_cache_evicts_least_recently_used():
+    response_cache = cache.ResponseCache(max_bytes=2500)
+    for key in ("a", "b"):
+        response_cache.set(key, 0, b"x" * 500, 200, [])
+    assert response_cache.get("a") is not None
+
+    response_cache.set("c", 0, b"x" * 500, 200, [])
+
+    assert response_cache.get("b") is None
+    assert response_cache.get("a")[0] == b"x" * 500
+    assert response_cache.get("c") is not None
+    stats = response_cache.stats()
+    assert (stats["entries"], stats["evictions"], stats["hits"], stats["misses"]) == (2, 1, 3, 1)
+    assert stats["bytes"] == 2 * (500 + cache.ENTRY_OVERHEAD)
+
+def test_response_cache_skips_responses_of_older_generation():
+    response_cache = cache.ResponseCache()
+    generation = response_cache.generation
+    response_cache.invalidate()
+    response_cache.set("a", generation, b"old", 200, [])
+    response_cache.set("b", 0, b"x" * (response_cache.max_bytes + 1), 200, [])
+
+    assert response_cache.get("a") is None
+    assert response_cache.get("b") is None
+
+def test_cached_response_serves_repeated_requests(app, insert_cases):
+    insert_cases([("Austria", "AT", "2020-04-01", 10)])
+    client = app.test_client()
+
+    first = client.get("/covid19/cases-by-country?country=Austria")
+    # countries are compared case insensitive, so both requests share an entry
+    second = client.get("/covid19/cases-by-country?country=AUSTRIA")
+
+    stats = client.get("/status").get_json()["response_cache"]
+    assert second.get_data() == first.get_data()
+    assert (stats["entries"], stats["hits"], stats["misses"]) == (1, 1, 1)
+
+def test_invalidate_empties_cache(app, insert_cases):
+    insert_cases([("Austria", "AT", "2020-04-01", 10)])
+    client = app.test_client()
+    client.get("/covid19/cases-by-country?country=Austria")
+
+    with app.app_context():
+        cache.invalidate()
+
+    stats = client.get("/status").get_json()["response_cache"]
+    assert (stats["entries"], stats["generation"]) == (0, 1)
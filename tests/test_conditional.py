@@ -0,0 +1,48 @@
+import time
+import pytest
+from src.importer import record_import_run
+
+@pytest.fixture
+def client(app, insert_cases):
+    insert_cases([("Austria", "AT", "2020-04-01", 10)])
+    with app.app_context():
+        record_import_run("covid", ["cases_time"], time.time() - 10)
+    return app.test_client()
+
+def test_responses_carry_validators_of_last_import(client):
+    response = client.get("/countries")
+    assert response.status_code == 200
+    assert response.headers["ETag"] == 'W/"import-1"'
+    assert response.headers["Last-Modified"]
+    assert response.headers["Cache-Control"] == "public, max-age=300"
+
+def test_if_none_match_is_answered_with_304(client):
+    etag = client.get("/countries").headers["ETag"]
+
+    response = client.get("/covid19/cases-by-country?country=Austria", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.get_data() == b""
+    assert response.headers["ETag"] == etag
+
+    assert client.get("/countries", headers={"If-None-Match": 'W/"import-0"'}).status_code == 200
+
+def test_if_modified_since_is_answered_with_304(client):
+    last_modified = client.get("/countries").headers["Last-Modified"]
+
+    assert client.get("/countries", headers={"If-Modified-Since": last_modified}).status_code == 304
+    assert client.get("/countries", headers={"If-Modified-Since": "Wed, 01 Apr 2020 00:00:00 GMT"}).status_code == 200
+
+def test_if_none_match_takes_precedence(client):
+    last_modified = client.get("/countries").headers["Last-Modified"]
+    response = client.get("/countries", headers={"If-None-Match": 'W/"import-0"', "If-Modified-Since": last_modified})
+    assert response.status_code == 200
+
+def test_errors_have_no_validators(client):
+    response = client.get("/covid19/cases-by-country?country=Austria&limit=0")
+    assert response.status_code == 400
+    assert "ETag" not in response.headers
+
+def test_no_validators_before_first_import(app):
+    response = app.test_client().get("/countries")
+    assert response.status_code == 200
+    assert "ETag" not in response.headers
@@ -0,0 +1,31 @@
+from src import db
+
+def insert_countries(insert_cases, countries, days=5):
+    insert_cases([(country, code, f"2020-04-0{day}", day) for country, code in countries for day in range(1, days + 1)])
+
+def test_export_limit(app, insert_cases):
+    insert_countries(insert_cases, [("Austria", "AT"), ("Germany", "DE")])
+    client = app.test_client()
+
+    lines = client.get("/export/cases_time?limit=3").get_data(as_text=True).splitlines()
+    assert [line.split(",")[:3] for line in lines[1:]] == [
+        ["Austria", "AT", "2020-04-01"], ["Austria", "AT", "2020-04-02"], ["Austria", "AT", "2020-04-03"]]
+
+    lines = client.get("/export/cases_time?code=de&since=2020-04-04&limit=10").get_data(as_text=True).splitlines()
+    assert [line.split(",")[2] for line in lines[1:]] == ["2020-04-04", "2020-04-05"]
+
+def test_export_rejects_cursor(app):
+    response = app.test_client().get("/export/cases_time?cursor=2020-04-02")
+    assert response.status_code == 400
+
+def test_export_filters_use_indexes(app):
+    with app.app_context():
+        connection = db.get_writer_db()
+        for condition, params in [
+            ("LOWER(country_region) IN (?) AND last_update >= ?", ["austria", 18353]),
+            ("LOWER(country_code) IN (?, ?)", ["at", "de"]),
+            ("last_update >= ? AND last_update <= ?", [18353, 18360]),
+        ]:
+            plan = connection.execute(
+                f"EXPLAIN QUERY PLAN SELECT * FROM cases_time WHERE {condition}", params).fetchall()
+            assert any(row[3].startswith("SEARCH cases_time USING INDEX") for row in plan), condition
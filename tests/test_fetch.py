@@ -0,0 +1,156 @@
+import os
+import time
+import functools
+import threading
+import pytest
+import requests
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from benchmarks.server import SourceHandler
+from src import fetch
+from src.fetch import SourceFetcher
+
+def write(path, content, mtime):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(content)
+    os.utime(path, ns=(mtime, mtime))
+
+def test_offline_fetch_detects_edited_mirror_file(tmp_path):
+    path = tmp_path / "cases_time"
+    write(path, "Country_Region,Last_Update\nAustria,4/20/20\n", 1_000_000_000)
+
+    with SourceFetcher(str(tmp_path), offline=True) as fetcher:
+        fetcher.fetch("cases_time", "http://mirror/cases_time.csv")
+        assert fetcher.changed_sources() == {"cases_time"}
+        fetcher.mark_imported()
+
+    with SourceFetcher(str(tmp_path), offline=True) as fetcher:
+        fetcher.fetch("cases_time", "http://mirror/cases_time.csv")
+        assert fetcher.changed_sources() == set()
+
+    write(path, "Country_Region,Last_Update\nAustria,4/21/20\n", 2_000_000_000)
+
+    with SourceFetcher(str(tmp_path), offline=True) as fetcher:
+        fetcher.fetch("cases_time", "http://mirror/cases_time.csv")
+        assert fetcher.changed_sources() == {"cases_time"}
+
+class Upstream:
+    """ Local stand-in for the upstream server. Each request of a path is
+    answered by the next of its responses (status, headers, body chunks,
+    seconds between chunks), the last one is repeated.
+    """
+
+    def __init__(self):
+        self.responses = {}
+        self.requests = []
+        upstream = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                upstream.requests.append((self.path, dict(self.headers)))
+                responses = upstream.responses[self.path]
+                status, headers, chunks, delay = responses.pop(0) if len(responses) > 1 else responses[0]
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(sum(len(chunk) for chunk in chunks)))
+                self.end_headers()
+                for chunk in chunks:
+                    time.sleep(delay)
+                    self.wfile.write(chunk)
+                    self.wfile.flush()
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+        self.thread = threading.Thread(target=self.server.serve_forever, args=(0.05,), daemon=True)
+        self.thread.start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+@pytest.fixture
+def upstream(monkeypatch):
+    monkeypatch.setattr(fetch, "FETCH_RETRY_BACKOFF", 0)
+    upstream = Upstream()
+    yield upstream
+    upstream.close()
+
+def test_fetch_retries_server_errors(tmp_path, upstream):
+    upstream.responses["/cases_time.csv"] = [(503, {}, [], 0), (503, {}, [], 0), (200, {}, [b"a,b\n"], 0)]
+
+    with SourceFetcher(str(tmp_path), retries=2) as fetcher:
+        path = fetcher.fetch("cases_time", upstream.url + "/cases_time.csv")
+
+    assert len(upstream.requests) == 3
+    assert (tmp_path / "cases_time").read_bytes() == b"a,b\n"
+    assert path == str(tmp_path / "cases_time")
+
+def test_fetch_gives_up_after_retries(tmp_path, upstream):
+    upstream.responses["/cases_time.csv"] = [(503, {}, [], 0)]
+
+    with SourceFetcher(str(tmp_path), retries=1) as fetcher:
+        with pytest.raises(requests.HTTPError):
+            fetcher.fetch("cases_time", upstream.url + "/cases_time.csv")
+
+    assert len(upstream.requests) == 2
+
+def test_fetch_does_not_retry_client_errors(tmp_path, upstream):
+    upstream.responses["/cases_time.csv"] = [(404, {}, [], 0)]
+
+    with SourceFetcher(str(tmp_path), retries=3) as fetcher:
+        with pytest.raises(requests.HTTPError):
+            fetcher.fetch("cases_time", upstream.url + "/cases_time.csv")
+
+    assert len(upstream.requests) == 1
+
+def test_fetch_sends_etag_and_keeps_file_on_304(tmp_path, upstream):
+    url = upstream.url + "/cases_time.csv"
+    upstream.responses["/cases_time.csv"] = [(200, {"ETag": '"v1"'}, [b"a,b\n"], 0), (304, {}, [], 0)]
+
+    with SourceFetcher(str(tmp_path)) as fetcher:
+        fetcher.fetch("cases_time", url)
+        fetcher.mark_imported()
+
+    with SourceFetcher(str(tmp_path)) as fetcher:
+        fetcher.fetch("cases_time", url)
+        assert fetcher.changed_sources() == set()
+
+    assert "If-None-Match" not in upstream.requests[0][1]
+    assert upstream.requests[1][1]["If-None-Match"] == '"v1"'
+    assert (tmp_path / "cases_time").read_bytes() == b"a,b\n"
+
+def test_fetch_sends_if_modified_since(tmp_path):
+    sources = tmp_path / "sources"
+    sources.mkdir()
+    (sources / "cases_time.csv").write_text("a,b\n", encoding="utf-8")
+    server = ThreadingHTTPServer(("127.0.0.1", 0), functools.partial(SourceHandler, directory=str(sources)))
+    threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/cases_time.csv"
+    try:
+        with SourceFetcher(str(tmp_path / "cache")) as fetcher:
+            fetcher.fetch("cases_time", url)
+            last_modified = fetcher.metas["cases_time"]["last_modified"]
+            fetched_at = fetcher.metas["cases_time"]["fetched_at"]
+
+        with SourceFetcher(str(tmp_path / "cache")) as fetcher:
+            fetcher.fetch("cases_time", url)
+            # a 304 does not rewrite the file and its meta
+            assert fetcher.metas["cases_time"]["fetched_at"] == fetched_at
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert last_modified is not None
+
+def test_fetch_timeout_limits_whole_download(tmp_path, upstream):
+    # every chunk arrives within the read timeout, the download does not
+    upstream.responses["/cases_time.csv"] = [(200, {}, [b"x" * 1024] * 10, 0.05)]
+
+    with SourceFetcher(str(tmp_path), retries=0, timeouts={"cases_time": 0.2}) as fetcher:
+        with pytest.raises(requests.Timeout):
+            fetcher.fetch("cases_time", upstream.url + "/cases_time.csv")
+
+    assert not (tmp_path / "cases_time").exists()
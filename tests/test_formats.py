@@ -0,0 +1,57 @@
+import pytest
+from werkzeug.datastructures import MultiDict
+from src.formats import Projection
+
+CASES = [
+    {"country": {"code": "AT", "name": "Austria"}, "confirmed": 1, "deaths": 0},
+    {"country": {"code": "DE", "name": "Germany"}, "confirmed": 2, "deaths": 1},
+]
+
+def test_record_projects_nested_fields():
+    assert Projection(["code", "confirmed"]).record(CASES[0]) == {"country": {"code": "AT"}, "confirmed": 1}
+    assert Projection(["country"]).record(CASES[0]) == {"country": {"code": "AT", "name": "Austria"}}
+    assert Projection(["deaths"]).record(CASES[0]) == {"deaths": 0}
+    assert Projection().record(CASES[0]) is CASES[0]
+
+def test_columnar_records_are_flattened():
+    assert Projection(["code", "confirmed"], columnar=True).records(CASES) == \
+        {"code": ["AT", "DE"], "confirmed": [1, 2]}
+
+def test_columns_as_records():
+    columns = {"date": ["2020-04-01", "2020-04-02"], "confirmed": [1, 2]}
+    assert Projection(columnar=True).columns(columns) is columns
+    assert Projection().columns(columns) == [
+        {"date": "2020-04-01", "confirmed": 1}, {"date": "2020-04-02", "confirmed": 2}]
+
+def test_from_args():
+    projection = Projection.from_args(MultiDict({"fields": " date, confirmed,", "format": "columnar"}))
+    assert (projection.fields, projection.columnar) == (["date", "confirmed"], True)
+    assert Projection.from_args(MultiDict()).fields is None
+    with pytest.raises(ValueError, match="format must be one of records, columnar"):
+        Projection.from_args(MultiDict({"format": "csv"}))
+
+@pytest.fixture
+def client(app, insert_cases):
+    insert_cases([("Austria", "AT", f"2020-04-0{day}", day) for day in (1, 2)])
+    return app.test_client()
+
+def test_timeline_fields_always_include_date(client):
+    response = client.get("/covid19/cases-by-country?country=Austria&fields=confirmed")
+    assert response.get_json()["timeline"] == [
+        {"date": "2020-04-01", "confirmed": 1}, {"date": "2020-04-02", "confirmed": 2}]
+
+def test_columnar_timeline(client):
+    response = client.get("/covid19/cases-daily?format=columnar&fields=confirmed,deaths")
+    assert response.get_json() == {"date": ["2020-04-02", "2020-04-01"], "confirmed": [2, 1], "deaths": [0, 0]}
+
+def test_columnar_countries(client):
+    assert client.get("/countries?format=columnar&fields=code,name").get_json() == \
+        {"code": ["AT"], "name": ["Austria"]}
+
+def test_unknown_format_is_rejected(client):
+    for url in ("/countries", "/covid19/cases-total", "/covid19/cases-by-country?country=Austria&",
+                "/covid19/cases-daily"):
+        separator = "" if url.endswith("&") else "?"
+        response = client.get(f"{url}{separator}format=xml")
+        assert (response.status_code, response.get_data(as_text=True)) == \
+            (400, "format must be one of records, columnar"), url
@@ -0,0 +1,62 @@
+from src import db
+from src.loader import BulkLoader
+from src.importer import CovidImporter
+
+# like upstream, the ships are in the lookup table without iso codes
+LOOKUP_TABLE = [
+    "UID,iso2,iso3,Country_Region\n",
+    "40,AT,AUT,Austria\n",
+    "9999,,,Diamond Princess\n",
+    "8888,,,MS Zaandam\n",
+]
+CASES_TIME_HEADER = "Province_State,Country_Region,Last_Update,Confirmed,Deaths,Recovered,Delta_Confirmed,Delta_Recovered,iso3\n"
+
+def cases_time(confirmed_by_country, days=10, iso3=None):
+    """ Returns the lines of a web-data cases_time.csv with confirmed + day
+    cases on each day. Countries which are not in iso3 have no iso3 code.
+    """
+    lines = [CASES_TIME_HEADER]
+    for country, confirmed in confirmed_by_country.items():
+        code = (iso3 or {}).get(country, "")
+        for day in range(1, days + 1):
+            lines.append(f",{country},4/{day}/20,{confirmed + day},0,0,1,0,{code}\n")
+    return lines
+
+def stored_cases(connection):
+    return connection.execute(
+        "SELECT country_region, country_code, last_update, confirmed FROM cases_time ORDER BY 1, 3"
+    ).fetchall()
+
+def test_upsert_keeps_countries_without_code_apart(app):
+    with app.app_context():
+        importer = CovidImporter()
+        importer.loader = BulkLoader.from_config()
+        importer.init_lookup_table(LOOKUP_TABLE)
+        importer._read_and_import_csv(cases_time({"Diamond Princess": 100, "MS Zaandam": 200}), "cases_time")
+
+        importer._upsert_cases_time(cases_time({"Diamond Princess": 1000, "MS Zaandam": 2000}))
+
+        rows = stored_cases(db.get_writer_db())
+        assert len(rows) == 20
+        assert {row["country_code"] for row in rows} == {None}
+        for country, confirmed in (("Diamond Princess", 1000), ("MS Zaandam", 2000)):
+            country_rows = [row for row in rows if row["country_region"] == country]
+            assert len(country_rows) == 10
+            # the last IMPORT_REVISION_DAYS + 1 days are updated
+            assert [row["confirmed"] for row in country_rows[-8:]] == [confirmed + day for day in range(3, 11)]
+
+def test_upsert_writes_only_new_and_changed_rows(app):
+    with app.app_context():
+        importer = CovidImporter()
+        importer.loader = BulkLoader.from_config()
+        importer.init_lookup_table(LOOKUP_TABLE)
+        importer._read_and_import_csv(cases_time({"Austria": 100}, iso3={"Austria": "AUT"}), "cases_time")
+
+        # the counts are merged from the master timeseries, they are not
+        # rewritten by the upsert
+        row_count = importer._upsert_cases_time(cases_time({"Austria": 1000}, days=11, iso3={"Austria": "AUT"}))
+
+        rows = stored_cases(db.get_writer_db())
+        assert row_count == 1
+        assert [row["confirmed"] for row in rows] == [100 + day for day in range(1, 11)] + [1011]
+        assert {row["country_code"] for row in rows} == {"AT"}
@@ -0,0 +1,79 @@
+import time
+import pytest
+from src import create_app
+from src.jobs import Job
+from src.importer import record_import_run
+
+def test_apps_of_one_database_share_runner_and_scheduler(config):
+    config = dict(config, IMPORT_INTERVAL=3600)
+    first_app, second_app = create_app(config), create_app(config)
+    runner = first_app.extensions["jobs"]
+    try:
+        assert second_app.extensions["jobs"] is runner
+        assert runner._scheduler is not None
+        assert len(runner._scheduler.get_jobs()) == 1
+    finally:
+        runner.shutdown()
+
+def test_import_of_other_app_reloads_responses(app, config):
+    serving_app = create_app(config)
+    client = serving_app.test_client()
+    with app.app_context():
+        record_import_run("countries", ["countries"], time.time())
+
+    assert client.get("/countries").headers["ETag"] == 'W/"import-1"'
+
+    with app.app_context():
+        record_import_run("covid", ["cases_time"], time.time())
+
+    response = client.get("/countries")
+    assert response.headers["ETag"] == 'W/"import-2"'
+    assert client.get("/status").get_json()["response_cache"]["import_run"] == 2
+    serving_app.extensions["db_pool"].close_all()
+
+@pytest.mark.parametrize("query, options", [
+    ("", {"force": False, "full": False}),
+    ("&force=1&full=true", {"force": True, "full": True}),
+    ("&force=0&full=false", {"force": False, "full": False}),
+])
+def test_import_url_parses_boolean_flags(app, monkeypatch, query, options):
+    # only the options of the job are checked, it is not run
+    monkeypatch.setattr(app.extensions["jobs"], "submit", lambda kind, **options: Job(kind, options))
+    secret = app.config["IMPORTER_SECRET_KEY"]
+    response = app.test_client().get(f"/covid19/import_data?pw={secret}{query}")
+    assert response.get_json()["options"] == options
+
+def query_count(app):
+    series = app.extensions["metrics"].query_seconds._series
+    return sum(sum(counts) for counts, _ in series.values())
+
+def test_unchanged_database_is_not_queried_per_request(app):
+    with app.app_context():
+        record_import_run("countries", ["countries"], time.time())
+    client = app.test_client()
+    etag = client.get("/countries").headers["ETag"]
+
+    queries = query_count(app)
+    assert client.get("/countries").status_code == 200
+    assert client.get("/countries", headers={"If-None-Match": etag}).status_code == 304
+    assert query_count(app) == queries
+
+def test_import_job_invalidates_all_apps_of_runner(app, config, monkeypatch):
+    serving_app = create_app(config)
+    runner = app.extensions["jobs"]
+
+    def run_import(job):
+        record_import_run(job.kind, ["countries"], time.time())
+        return ["countries"]
+
+    monkeypatch.setattr(runner, "run_import", run_import)
+    generation = serving_app.extensions["response_cache"].generation
+    job = runner.submit("countries")
+    while job.state in ("queued", "running"):
+        time.sleep(0.01)
+
+    response_cache = serving_app.extensions["response_cache"]
+    assert job.state == "finished"
+    assert response_cache.generation == generation + 1
+    assert response_cache.import_run == 1
+    serving_app.extensions["db_pool"].close_all()
@@ -0,0 +1,17 @@
+from src.metrics import Histogram, query_label
+
+def test_query_label_replaces_literals():
+    assert query_label("SELECT * FROM cases_time WHERE country_code = 'AT' AND last_update >= 18350 LIMIT 10") \
+        == "SELECT * FROM cases_time WHERE country_code = ? AND last_update >= ? LIMIT ?"
+    assert query_label("SELECT * FROM countries WHERE name IN ('Cote d''Ivoire', 'Austria')") \
+        == "SELECT * FROM countries WHERE name IN (?)"
+    assert query_label("SELECT delta_confirmed2 FROM t WHERE x = 1.5") == "SELECT delta_confirmed2 FROM t WHERE x = ?"
+
+def test_histogram_counts_series_beyond_max_series_as_other():
+    histogram = Histogram("test_seconds", "Test.", ("query",), (0.1, 1), max_series=2)
+    for query in ("a", "b", "c", "d", "a"):
+        histogram.observe((query,), 0.5)
+
+    assert histogram._series[("a",)][0] == [0, 2, 0]
+    assert histogram._series[("other",)][0] == [0, 2, 0]
+    assert set(histogram._series) == {("a",), ("b",), ("other",)}
@@ -0,0 +1,95 @@
+import pytest
+
+def get_pages(client, url):
+    """ Returns the responses of url and of all following pages.
+    """
+    pages = [client.get(url)]
+    while "X-Next-Cursor" in pages[-1].headers:
+        pages.append(client.get(f"{url}&cursor={pages[-1].headers['X-Next-Cursor']}"))
+    return pages
+
+def test_cursor_pages_countries_with_different_date_ranges(app, insert_cases):
+    insert_cases([("Austria", "AT", f"2020-04-0{day}", day) for day in range(1, 10)]
+                 + [("Germany", "DE", f"2020-04-0{day}", day) for day in range(5, 7)])
+
+    pages = get_pages(app.test_client(), "/covid19/cases-by-country?country=Austria,Germany&limit=3")
+
+    dates = {"Austria": [], "Germany": []}
+    for page in pages:
+        assert page.status_code == 200
+        for item in page.get_json():
+            dates[item["country"]["name"]] += [entry["date"] for entry in item["timeline"]]
+    assert dates["Austria"] == [f"2020-04-0{day}" for day in range(1, 10)]
+    assert dates["Germany"] == ["2020-04-05", "2020-04-06"]
+
+@pytest.fixture
+def client(app, insert_cases):
+    insert_cases([("Austria", "AT", f"2020-04-{day:02}", day) for day in range(1, 11)])
+    return app.test_client()
+
+def timeline_dates(pages):
+    return [entry["date"] for page in pages for entry in page.get_json()["timeline"]]
+
+def test_since_and_until_limit_the_timeline(client):
+    response = client.get("/covid19/cases-by-country?country=Austria&since=2020-04-03&until=2020-04-05")
+    assert timeline_dates([response]) == ["2020-04-03", "2020-04-04", "2020-04-05"]
+    assert "X-Next-Cursor" not in response.headers
+
+def test_cursor_pages_timeline(client):
+    pages = get_pages(client, "/covid19/cases-by-country?country=Austria&since=2020-04-02&limit=4")
+    assert [page.headers.get("X-Next-Cursor") for page in pages] == ["2020-04-05", "2020-04-09", None]
+    assert timeline_dates(pages) == [f"2020-04-{day:02}" for day in range(2, 11)]
+
+def test_cursor_pages_daily_cases_descending(client):
+    pages = get_pages(client, "/covid19/cases-daily?country=Austria&limit=4")
+    dates = [entry["date"] for page in pages for entry in page.get_json()]
+    assert dates == [f"2020-04-{day:02}" for day in range(10, 0, -1)]
+    assert len(pages) == 3
+
+@pytest.mark.parametrize("query, message", [
+    ("since=2020-13-01", "since must be a date (YYYY-MM-DD)"),
+    ("until=yesterday", "until must be a date (YYYY-MM-DD)"),
+    ("cursor=1", "cursor must be a date (YYYY-MM-DD)"),
+    ("limit=0", "limit must be a positive number"),
+    ("limit=-1", "limit must be a positive number"),
+    ("limit=ten", "limit must be a positive number"),
+])
+def test_invalid_page_parameters_are_rejected(client, query, message):
+    for url in ("/covid19/cases-by-country?country=Austria&", "/covid19/cases-daily?"):
+        response = client.get(url + query)
+        assert (response.status_code, response.get_data(as_text=True)) == (400, message)
+
+@pytest.fixture
+def batch_client(app, insert_cases):
+    insert_cases([(country, code, f"2020-04-0{day}", day) for day in (1, 2)
+                  for country, code in (("Austria", "AT"), ("Germany", "DE"), ("Korea, South", "KR"))])
+    return app.test_client()
+
+def test_countries_are_given_as_lists(batch_client):
+    for query in ("country=Austria,Korea, South", "country=austria&country=KOREA, SOUTH", "code=at,kr"):
+        response = batch_client.get(f"/countries?{query}")
+        assert [country["name"] for country in response.get_json()] == ["Austria", "Korea, South"], query
+
+    assert batch_client.get("/countries?code=de").get_json()["name"] == "Germany"
+
+def test_cases_by_country_returns_timeline_of_each_country(batch_client):
+    response = batch_client.get("/covid19/cases-by-country?code=de,xx,at")
+    assert [item["country"]["code"] for item in response.get_json()] == ["DE", "AT"]
+    assert all(len(item["timeline"]) == 2 for item in response.get_json())
+
+    assert batch_client.get("/covid19/cases-by-country?code=xx").get_json() == {}
+
+def test_cases_daily_sums_listed_countries(batch_client):
+    response = batch_client.get("/covid19/cases-daily?country=Austria,Germany")
+    assert [(entry["date"], entry["confirmed"]) for entry in response.get_json()] == \
+        [("2020-04-02", 4), ("2020-04-01", 2)]
+
+def test_too_many_countries_are_rejected(batch_client):
+    codes = ",".join(f"c{i}" for i in range(51))
+    for url in ("/countries", "/covid19/cases-total", "/covid19/cases-by-country", "/covid19/cases-daily"):
+        response = batch_client.get(f"{url}?code={codes}")
+        assert (response.status_code, response.get_data(as_text=True)) == \
+            (400, "at most 50 countries per request"), url
+
+def test_cases_by_country_needs_a_country(batch_client):
+    assert batch_client.get("/covid19/cases-by-country").status_code == 400
@@ -0,0 +1,38 @@
+import gzip
+import json
+import pytest
+from src import snapshots
+
+@pytest.fixture
+def client(app, insert_cases):
+    insert_cases([("Austria", "AT", "2020-04-01", 10), ("Germany", "DE", "2020-04-01", 20)])
+    with app.app_context():
+        snapshots.build_snapshots()
+    return app.test_client()
+
+def test_snapshot_is_served_in_best_accepted_encoding(client):
+    identity = client.get("/countries", headers={"Accept-Encoding": ""})
+    assert "Content-Encoding" not in identity.headers
+    assert [country["name"] for country in identity.get_json()] == ["Austria", "Germany"]
+
+    response = client.get("/countries", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert response.headers["Vary"] == "Accept-Encoding"
+    assert gzip.decompress(response.get_data()) == identity.get_data()
+
+def test_snapshot_prefers_brotli(client):
+    brotli = pytest.importorskip("brotli")
+    response = client.get("/countries", headers={"Accept-Encoding": "gzip, br"})
+    assert response.headers["Content-Encoding"] == "br"
+    assert json.loads(brotli.decompress(response.get_data())) == client.get("/countries").get_json()
+
+def test_filtered_requests_are_not_served_from_snapshots(client):
+    response = client.get("/countries?code=at", headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in response.headers
+    assert response.get_json()["name"] == "Austria"
+
+def test_worldwide_snapshot_needs_true_flag(client):
+    worldwide = client.get("/covid19/cases-total?worldwide=1", headers={"Accept-Encoding": "gzip"})
+    not_worldwide = client.get("/covid19/cases-total?worldwide=0")
+    assert worldwide.headers["Content-Encoding"] == "gzip"
+    assert isinstance(not_worldwide.get_json(), list)
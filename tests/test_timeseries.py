@@ -0,0 +1,42 @@
+import pytest
+from src import db
+from src.timeseries import TimeSeries
+from src.utils import iso_to_day
+
+@pytest.fixture
+def series(app, insert_cases):
+    insert_cases([("Austria", "AT", f"2020-04-0{day}", day) for day in (1, 2, 3, 5)]
+                 + [("Germany", "DE", f"2020-04-0{day}", 10 * day) for day in (2, 3)])
+    with app.app_context():
+        connection = db.get_writer_db()
+        with connection:
+            connection.execute("INSERT INTO cases_time (country_region, last_update) VALUES ('Italy', ?)",
+                               (iso_to_day("2020-04-04"),))
+        return TimeSeries.load(connection)
+
+def test_find_is_case_insensitive(series):
+    assert [series.regions[i] for i in series.find(countries=["austria", "GERMANY", "unknown"])] == \
+        ["Austria", "Germany"]
+    assert [series.regions[i] for i in series.find(codes=["de"])] == ["Germany"]
+    assert len(series.find()) == 3
+
+def test_columns_sum_countries_per_day(series):
+    columns = series.columns(series.find(countries=["Austria", "Germany"]), ["confirmed", "deaths"])
+    assert columns == {
+        "date": ["2020-04-01", "2020-04-02", "2020-04-03", "2020-04-05"],
+        "confirmed": [1, 22, 33, 5],
+        "deaths": [0, 2, 3, 0],
+    }
+
+def test_columns_of_rows_without_values_are_none(series):
+    assert series.columns(series.find(countries=["Italy"]), ["confirmed"]) == \
+        {"date": ["2020-04-04"], "confirmed": [None]}
+
+def test_columns_since_until_limit(series):
+    austria = series.find(countries=["Austria"])
+    since, until = iso_to_day("2020-04-02"), iso_to_day("2020-04-05")
+
+    assert series.columns(austria, [], since=since, until=until)["date"] == ["2020-04-02", "2020-04-03", "2020-04-05"]
+    assert series.columns(austria, [], since=since, limit=2)["date"] == ["2020-04-02", "2020-04-03"]
+    assert series.columns(austria, [], until=until, limit=2, descending=True)["date"] == ["2020-04-05", "2020-04-03"]
+    assert series.columns(austria, [], since=iso_to_day("2020-04-06"))["date"] == []